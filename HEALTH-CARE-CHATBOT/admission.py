@@ -0,0 +1,211 @@
+"""Admission control and load shedding for expensive endpoints.
+
+Each guarded endpoint gets
+
+* a per-client token bucket (``rate`` requests/second, ``burst`` deep);
+  an empty bucket is answered at once with ``429`` and ``Retry-After``
+* a concurrency limit with a bounded wait queue; a request that finds the
+  queue full, or waits longer than ``queue_timeout``, gets ``503`` with a
+  ``Retry-After`` estimated from recent service times
+
+Rejections happen before the handler runs (and before the body is parsed),
+so a surge costs a few dictionary operations per request instead of piling
+up in the server. A streamed response keeps its concurrency slot until the
+stream is closed, since that is where its work happens. Counters for every
+guard are exposed through ``stats()``.
+"""
+import collections
+import functools
+import math
+import threading
+import time
+
+from flask import jsonify
+
+
+class TokenBucket:
+    """``rate`` tokens per second, at most ``burst`` stored."""
+
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, rate, burst, now):
+        """Take one token; return 0 on success, else seconds until one is free."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate
+
+
+class RateLimiter:
+    """Per-client token buckets, least recently seen clients evicted first."""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client):
+        """0 if the request may proceed, else the suggested retry delay."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            return bucket.take(self.rate, self.burst, now)
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` requests in flight, at most ``queue_size`` waiting."""
+
+    def __init__(self, limit, queue_size, queue_timeout):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = threading.Semaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.queued = 0
+        self.queue_full = 0
+        self.timed_out = 0
+        # Exponentially weighted service time, for Retry-After estimates
+        self.avg_seconds = 0.0
+
+    def acquire(self):
+        """True once a slot is held; False if the request should be shed."""
+        if self._slots.acquire(blocking=False):
+            self._admitted()
+            return True
+        with self._lock:
+            if self.waiting >= self.queue_size:
+                self.queue_full += 1
+                return False
+            self.waiting += 1
+            self.queued += 1
+        acquired = False
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                if not acquired:
+                    self.timed_out += 1
+        if acquired:
+            self._admitted()
+        return acquired
+
+    def _admitted(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, elapsed):
+        with self._lock:
+            self.in_flight -= 1
+            self.avg_seconds = elapsed if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * elapsed
+        self._slots.release()
+
+    def retry_after(self):
+        """Seconds until the current backlog has likely drained."""
+        backlog = self.waiting + self.in_flight + 1
+        return max(1, math.ceil(self.avg_seconds * backlog / self.limit))
+
+
+class _Guard:
+    def __init__(self, name, limiter, rate_limiter):
+        self.name = name
+        self.limiter = limiter
+        self.rate_limiter = rate_limiter
+        self.counters = collections.Counter()
+
+    def stats(self):
+        stats = dict(self.counters)
+        if self.limiter:
+            stats.update({
+                'limit': self.limiter.limit,
+                'queue_size': self.limiter.queue_size,
+                'in_flight': self.limiter.in_flight,
+                'waiting': self.limiter.waiting,
+                'peak_in_flight': self.limiter.peak_in_flight,
+                'queued': self.limiter.queued,
+                'shed_queue_full': self.limiter.queue_full,
+                'shed_timeout': self.limiter.timed_out,
+                'avg_ms': round(self.limiter.avg_seconds * 1000, 2),
+            })
+        return stats
+
+
+def _reject(status, retry_after, message):
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+class AdmissionController:
+    """Registry of guarded endpoints sharing a client-key function."""
+
+    def __init__(self, client_key=None, rate=0.0, burst=0):
+        self.client_key = client_key or (lambda: None)
+        self.rate = rate
+        self.burst = burst
+        self._guards = {}
+
+    def guard(self, name, limit=None, queue_size=0, queue_timeout=1.0, rate=None, burst=None):
+        """Decorator applying rate and concurrency limits to a handler.
+
+        ``rate``/``burst`` default to the controller-wide values; a rate of
+        0 disables rate limiting and a ``limit`` of None disables the
+        concurrency limit.
+        """
+        rate = self.rate if rate is None else rate
+        burst = self.burst if burst is None else burst
+        limiter = ConcurrencyLimiter(limit, queue_size, queue_timeout) if limit else None
+        rate_limiter = RateLimiter(rate, max(1, burst)) if rate > 0 else None
+        guard = self._guards[name] = _Guard(name, limiter, rate_limiter)
+
+        def decorator(handler):
+            @functools.wraps(handler)
+            def wrapper(*args, **kwargs):
+                if rate_limiter:
+                    wait = rate_limiter.check(self.client_key())
+                    if wait:
+                        guard.counters['rate_limited'] += 1
+                        return _reject(429, max(1, math.ceil(wait)), 'Too many requests, please slow down')
+                if limiter is None:
+                    guard.counters['admitted'] += 1
+                    return handler(*args, **kwargs)
+                if not limiter.acquire():
+                    guard.counters['shed'] += 1
+                    return _reject(503, limiter.retry_after(), 'Server busy, please retry shortly')
+                guard.counters['admitted'] += 1
+                start = time.perf_counter()
+                streamed = False
+                try:
+                    response = handler(*args, **kwargs)
+                    if getattr(response, 'is_streamed', False):
+                        # The body is produced while it is sent; release when it closes
+                        response.call_on_close(lambda: limiter.release(time.perf_counter() - start))
+                        streamed = True
+                    return response
+                finally:
+                    if not streamed:
+                        limiter.release(time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        return {name: guard.stats() for name, guard in self._guards.items()}
@@ -0,0 +1,164 @@
+"""Streaming analytics over diagnoses with fixed memory.
+
+* ``RollingCounter``  ring buffer of per-bucket counts for a sliding window
+* ``CountMinSketch``  approximate per-key frequencies (symptoms) in a fixed
+                      ``depth x width`` table; never under-counts
+* ``TopK``            Space-Saving heavy hitters (diseases) over ``k`` slots
+
+Every update touches a constant number of cells, and memory is set by the
+constructor arguments, not by traffic volume.
+"""
+import threading
+import time
+import zlib
+
+import numpy as np
+
+
+class RollingCounter:
+    """Event count over the last ``window`` seconds in ``bucket``-second slots."""
+
+    def __init__(self, window=3600, bucket=60):
+        self.bucket = bucket
+        self.slots = int(window // bucket)
+        self._counts = [0] * self.slots
+        self._stamps = [-1] * self.slots
+        self.total = 0
+
+    def add(self, n=1, now=None):
+        tick = int((time.time() if now is None else now) // self.bucket)
+        i = tick % self.slots
+        if self._stamps[i] != tick:
+            self._stamps[i] = tick
+            self._counts[i] = 0
+        self._counts[i] += n
+        self.total += n
+
+    def count(self, seconds=None, now=None):
+        """Events in the last ``seconds`` (default: the whole window)."""
+        tick = int((time.time() if now is None else now) // self.bucket)
+        span = self.slots if seconds is None else max(1, min(self.slots, int(seconds // self.bucket)))
+        return sum(c for c, s in zip(self._counts, self._stamps) if tick - span < s <= tick)
+
+
+class CountMinSketch:
+    """Approximate frequency table: ``estimate(key) >= true count``."""
+
+    def __init__(self, width=512, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)
+
+    def _cells(self, key):
+        data = str(key).encode('utf-8')
+        return [zlib.crc32(data, seed) % self.width for seed in range(1, self.depth + 1)]
+
+    def add(self, key, n=1):
+        self.table[self._rows, self._cells(key)] += n
+
+    def estimate(self, key):
+        return int(self.table[self._rows, self._cells(key)].min())
+
+
+class TopK:
+    """Space-Saving heavy hitters: the ``k`` most frequent keys, approximately.
+
+    Keys are kept in buckets by count (the stream-summary structure), and
+    the lowest count is tracked, so finding the key to evict is O(1). A
+    unit increment is O(1) as well; only larger ``n`` may rescan the bucket
+    counts, which are at most ``k``.
+    """
+
+    def __init__(self, k=20):
+        self.k = k
+        self._counts = {}
+        self._errors = {}
+        self._buckets = {}    # count -> {key: None}, in arrival order
+        self._min = None
+
+    def _place(self, key, old, new):
+        """Move ``key`` from the ``old`` count bucket (None if new) to ``new``."""
+        self._counts[key] = new
+        self._buckets.setdefault(new, {})[key] = None
+        if old is None:
+            self._min = new if self._min is None else min(self._min, new)
+            return
+        bucket = self._buckets[old]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[old]
+            if old == self._min:
+                # Nothing lies between old and old + 1, so unit steps stay O(1)
+                self._min = new if new == old + 1 else min(self._buckets)
+
+    def add(self, key, n=1):
+        if key in self._counts:
+            self._place(key, self._counts[key], self._counts[key] + n)
+        elif len(self._counts) < self.k:
+            self._errors[key] = 0
+            self._place(key, None, n)
+        else:
+            floor = self._min
+            bucket = self._buckets[floor]
+            victim = next(iter(bucket))
+            del self._counts[victim]
+            del self._errors[victim]
+            # The new key takes over the victim's slot and count
+            self._counts[key] = floor
+            bucket[key] = None
+            del bucket[victim]
+            self._errors[key] = floor
+            self._place(key, floor, floor + n)
+
+    def top(self, n=None):
+        ranked = sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [{'key': k, 'count': c, 'max_error': self._errors[k]} for k, c in ranked]
+
+
+class Analytics:
+    """Thread-safe aggregate of diagnosis traffic."""
+
+    def __init__(self, window=3600, bucket=60, top_k=20, sketch_width=512, sketch_depth=4):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {name: RollingCounter(window, bucket)
+                         for name in ('diagnoses', 'followups', 'emergencies', 'unmatched')}
+        self.symptoms = CountMinSketch(sketch_width, sketch_depth)
+        # Extracted symptoms are always model columns, so this set is bounded
+        self.symptom_keys = set()
+        self.diseases = TopK(top_k)
+
+    def record_diagnosis(self, disease, symptoms):
+        with self._lock:
+            self.counters['diagnoses'].add()
+            if disease:
+                self.diseases.add(disease)
+            for symptom in symptoms:
+                self.symptoms.add(symptom)
+                self.symptom_keys.add(symptom)
+
+    def record_unmatched(self):
+        with self._lock:
+            self.counters['unmatched'].add()
+
+    def record_followup(self, emergency):
+        with self._lock:
+            self.counters['followups'].add()
+            if emergency:
+                self.counters['emergencies'].add()
+
+    def snapshot(self, top=10):
+        with self._lock:
+            counters = {
+                name: {'last_5m': c.count(300), 'last_window': c.count(), 'total': c.total}
+                for name, c in self.counters.items()
+            }
+            symptoms = sorted(((s, self.symptoms.estimate(s)) for s in self.symptom_keys),
+                              key=lambda kv: kv[1], reverse=True)[:top]
+            return {
+                'uptime_seconds': round(time.time() - self.started),
+                'counters': counters,
+                'top_diseases': self.diseases.top(top),
+                'top_symptoms': [{'key': s, 'count': c} for s, c in symptoms],
+            }
@@ -1,10 +1,22 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, url_for, Response, abort
 import io
+import hashlib
 import datetime
 import logging
 import traceback
+import atexit
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 import os
+import tracemalloc
+from types import MappingProxyType
+
+# Allocation tracking for /api/admin/memory; started before anything else is
+# loaded so startup allocations are attributed too (MEDICHAT_TRACEMALLOC=<frames>)
+if os.environ.get('MEDICHAT_TRACEMALLOC'):
+    tracemalloc.start(int(os.environ['MEDICHAT_TRACEMALLOC']))
 
 # Base directory for data files (make file paths robust regardless of cwd)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,119 +38,189 @@ except Exception:
 # Chatbot display name used in reports
 CHATBOT_NAME = 'MediChat'
 import re
-import pandas as pd
-import pyttsx3
-from sklearn import preprocessing
-from sklearn.tree import DecisionTreeClassifier, _tree
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.model_selection import cross_val_score
-from sklearn.svm import SVC
 import csv
+from knowledge import KnowledgeStore
+from history import ConsultationStore
+from analytics import Analytics
+from profiling import RequestProfiler
+from assets import AssetStore, IMMUTABLE_CACHE
+from responses import FastJSONProvider, StaticPayload, compress_response
+from admission import AdmissionController
+from reports import render_pdf, report_filename, render_all, stream_zip, process_pool
+from pdf_layout import render_layout_pdf
+from registry import ModelRegistry, ModelVersion, UNCHANGED
+from serving import FlatTree, ServingArtifact
+from memory import MemoryTracker
+from tts import TTSRenderer, TTSUnavailable
+from disease_search import DiseaseIndex, load_aliases
+from similarity import DiseaseSimilarity, METRICS
+from online import OnlineLearner
+
+# Lean serving: load a prebuilt model artifact instead of the training CSVs.
+# Such a worker never imports pandas or scikit-learn (see serving.py)
+SERVING_ARTIFACT = os.environ.get('MEDICHAT_SERVING_ARTIFACT', '')
+LEAN = bool(SERVING_ARTIFACT)
+if not LEAN:
+    import pandas as pd
+    from sklearn import preprocessing
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.model_selection import cross_val_score
+    from sklearn.svm import SVC
+    from training_data import compress_rows, compression_report
+    from compact_model import fit_compact
+    from ensemble import FlatForest, fit_forest
 # ==================== DATA LOADING ====================
-logging.info('Loading data...')
-training = pd.read_csv(os.path.join(BASE_DIR, 'Training.csv'))
-testing = pd.read_csv(os.path.join(BASE_DIR, 'Testing.csv'))
-cols = training.columns
-cols = cols[:-1]
-x = training[cols]
-y = training['prognosis']
-y1 = y
-
-reduced_data = training.groupby(training['prognosis']).max()
-
-# Mapping strings to numbers
-le = preprocessing.LabelEncoder()
-le.fit(y)
-y = le.transform(y)
-
-x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.33, random_state=42)
-testx = testing[cols]
-testy = testing['prognosis']
-testy = le.transform(testy)
-
-clf1 = DecisionTreeClassifier()
-clf = clf1.fit(x_train, y_train)
-
-# Print model scores
-scores = cross_val_score(clf, x_test, y_test, cv=3)
-logging.info('DecisionTree cross-val mean score: %.4f', scores.mean())
-
-model = SVC()
-model.fit(x_train, y_train)
-logging.info('SVM test score: %.4f', model.score(x_test, y_test))
-
-importances = clf.feature_importances_
-indices = np.argsort(importances)[::-1]
-features = cols
-
-# ==================== GLOBAL DICTIONARIES ====================
-severityDictionary = dict()
-description_list = dict()
-precautionDictionary = dict()
+if LEAN:
+    logging.info('Loading serving artifact %s...', SERVING_ARTIFACT)
+    artifact = ServingArtifact.load(SERVING_ARTIFACT)
+    cols = artifact.symptoms
+    model_cols = artifact.columns
+    model_index = {symptom: i for i, symptom in enumerate(model_cols)}
+    class_labels = artifact.labels
+    disease_symptoms = artifact.disease_symptoms
+    served_tree = artifact.tree
+    served_accuracy = artifact.accuracy
+    forest = None
+    ensemble_executor = None
+else:
+    logging.info('Loading data...')
+    training = pd.read_csv(os.path.join(BASE_DIR, 'Training.csv'))
+    testing = pd.read_csv(os.path.join(BASE_DIR, 'Testing.csv'))
+    cols = training.columns
+    cols = cols[:-1]
+    x = training[cols]
+    y = training['prognosis']
+    y1 = y
+
+    reduced_data = training.groupby(training['prognosis']).max()
+
+    # Mapping strings to numbers
+    le = preprocessing.LabelEncoder()
+    le.fit(y)
+    y = le.transform(y)
+
+    x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.33, random_state=42)
+    testx = testing[cols]
+    testy = testing['prognosis']
+    testy = le.transform(testy)
+
+    # Collapse duplicate rows into unique rows + sample_weight counts
+    x_train_u, y_train_u, w_train = compress_rows(x_train, y_train)
+    x_test_u, y_test_u, w_test = compress_rows(x_test, y_test)
+    compression_report(len(x_train), w_train, 'train split')
+
+    clf1 = DecisionTreeClassifier()
+    clf = clf1.fit(x_train_u, y_train_u, sample_weight=w_train)
+
+    # Print model scores. CV runs on the raw rows: its scoring would ignore the
+    # counts of compressed rows
+    scores = cross_val_score(clf, x_test, y_test, cv=3)
+    logging.info('DecisionTree cross-val mean score: %.4f', scores.mean())
+
+    model = SVC()
+    model.fit(x_train_u, y_train_u, sample_weight=w_train)
+    logging.info('SVM test score: %.4f', model.score(x_test_u, y_test_u, sample_weight=w_test))
+
+    importances = clf.feature_importances_
+    indices = np.argsort(importances)[::-1]
+    features = cols
+
+    # Optional compact model: refit on the top-N symptoms by importance and serve
+    # that smaller tree instead (see compact_model.py for the accuracy tradeoff)
+    COMPACT_FEATURES = int(os.environ.get('MEDICHAT_COMPACT_FEATURES') or 0)
+    COMPACT_MAX_DEPTH = int(os.environ.get('MEDICHAT_COMPACT_MAX_DEPTH') or 0) or None
+    model_cols = list(cols)
+    if COMPACT_FEATURES:
+        model_cols = [features[i] for i in indices[:COMPACT_FEATURES]]
+        clf = fit_compact(x_train_u, y_train_u, w_train, model_cols, max_depth=COMPACT_MAX_DEPTH)
+        logging.info('Serving compact model: %d symptoms, depth %d, %d nodes',
+                     len(model_cols), clf.get_depth(), clf.tree_.node_count)
+    model_index = {symptom: i for i, symptom in enumerate(model_cols)}
+
+    # Optional ensemble: bagged trees compiled into a flat-array forest whose
+    # per-tree votes are returned alongside the single-tree diagnosis
+    ENSEMBLE_TREES = int(os.environ.get('MEDICHAT_ENSEMBLE_TREES') or 0)
+    forest = None
+    ensemble_executor = None
+    if ENSEMBLE_TREES:
+        _rf = fit_forest(x_train_u[model_cols], y_train_u, w_train, n_estimators=ENSEMBLE_TREES)
+        forest = FlatForest.from_forest(_rf, labels=le.inverse_transform(_rf.classes_))
+        ensemble_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        logging.info('Ensemble mode: %d trees, %d nodes', forest.n_trees, len(forest.feature))
+
+    # Compact serving structures shared with lean mode
+    class_labels = np.asarray(le.classes_)
+    disease_symptoms = {
+        disease: list(reduced_data.columns[np.asarray(row).nonzero()[0]])
+        for disease, row in zip(reduced_data.index, reduced_data.to_numpy())
+    }
+    served_tree = FlatTree.from_sklearn(clf)
+    served_accuracy = round(float(np.mean(clf.predict(testing[model_cols]) == testy)), 4)
 
-symptoms_dict = {}
+    # Only the compressed training rows (for /api/admin/models) and the small
+    # test set are needed from here on; release the full frames and the SVC
+    del training, x, y1, x_train, x_test, testx, x_test_u, y_test_u, w_test, reduced_data, model
 
-for index, symptom in enumerate(x):
-    symptoms_dict[symptom] = index
-description_list = dict()
-precautionDictionary = dict()
+# ==================== GLOBAL DICTIONARIES ====================
+# Serving state is built once and then only read, from any number of
+# request threads: tables are read-only mappings and arrays are read-only
+class_labels.flags.writeable = False
+disease_symptoms = MappingProxyType({disease: tuple(symptoms) for disease, symptoms in disease_symptoms.items()})
+symptoms_dict = MappingProxyType({symptom: index for index, symptom in enumerate(cols)})
 
-symptoms_dict = {}
+# ==================== HELPER FUNCTIONS ====================
 
-for index, symptom in enumerate(x):
-    symptoms_dict[symptom] = index
+# Upper bound on cases accepted by /api/diagnose_batch
+MAX_BATCH_CASES = 1000
 
-# ==================== HELPER FUNCTIONS ====================
+# Upper bound on reports in one /api/download_reports archive
+MAX_BULK_REPORTS = 500
 
 # Create Flask app
 app = Flask(__name__, static_folder='static', template_folder='templates')
+app.json = FastJSONProvider(app)
+# Oversized bodies are refused (413) before any JSON parsing
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MEDICHAT_MAX_BODY_KB') or 256) * 1024
 
 def readn(nstr):
-    """Text to speech function"""
-    engine = pyttsx3.init()
-    engine.setProperty('voice', "english+f5")
-    engine.setProperty('rate', 130)
-    engine.say(nstr)
-    engine.runAndWait()
-    engine.stop()
+    """Text to speech function: future resolving to a cached WAV clip name"""
+    return tts.submit(nstr)
 
 def getDescription():
     """Load disease descriptions from CSV"""
-    global description_list
+    descriptions = {}
     with open(os.path.join(BASE_DIR, 'symptom_Description.csv')) as csv_file:
         csv_reader = csv.reader(csv_file, delimiter=',')
-        line_count = 0
         for row in csv_reader:
-            _description = {row[0]: row[1]}
-            description_list.update(_description)
+            descriptions[row[0]] = row[1]
+    return descriptions
 
 def getSeverityDict():
     """Load symptom severity data from CSV"""
-    global severityDictionary
+    severity = {}
     with open(os.path.join(BASE_DIR, 'Symptom_severity.csv')) as csv_file:
         csv_reader = csv.reader(csv_file, delimiter=',')
-        line_count = 0
         try:
             for row in csv_reader:
-                _diction = {row[0]: int(row[1])}
-                severityDictionary.update(_diction)
+                severity[row[0]] = int(row[1])
         except:
             pass
+    return severity
 
 def getprecautionDict():
     """Load precaution data from CSV"""
-    global precautionDictionary
+    precautions_by_disease = {}
     with open(os.path.join(BASE_DIR, 'symptom_precaution.csv')) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        line_count = 0
         for row in csv_file:
             if row.strip() and not row.startswith('Disease'):
                 parts = row.strip().split(',', 4)
                 if len(parts) >= 5:
                     disease_name = parts[0].strip()
-                    precautions = [parts[1].strip(), parts[2].strip(), parts[3].strip(), parts[4].strip()]
-                    precautionDictionary[disease_name] = precautions
+                    precautions = (parts[1].strip(), parts[2].strip(), parts[3].strip(), parts[4].strip())
+                    precautions_by_disease[disease_name] = precautions
+    return precautions_by_disease
 
 def calc_condition(exp, days):
     """Calculate severity condition"""
@@ -151,99 +233,10 @@ def calc_condition(exp, days):
     else:
         return "It might not be that bad but you should take precautions."
 
-def extract_symptoms_from_text(text, symptom_list):
+def extract_symptoms_from_text(text, symptom_list, typos=True):
     """Extract symptoms from natural language text"""
-    extracted_symptoms = []
-    text_lower = text.lower()
-    
-    # Comprehensive symptom mapping with common phrases
-    phrases = {
-        'fever': ['fever', 'high temperature', 'temperature', 'hot', 'running fever'],
-        'cough': ['cough', 'coughing', 'dry cough', 'wet cough', 'persistent cough'],
-        'headache': ['headache', 'head pain', 'migraine', 'head ache'],
-        'body ache': ['body ache', 'body pain', 'ache', 'pain in body', 'muscle ache', 'muscle pain'],
-        'fatigue': ['fatigue', 'tired', 'tiredness', 'exhausted', 'weakness', 'weak'],
-        'cold': ['cold', 'common cold', 'catch a cold'],
-        'nausea': ['nausea', 'feel sick', 'vomiting', 'puke', 'feeling sick'],
-        'diarrhea': ['diarrhea', 'loose motion', 'loose stools', 'loose motions'],
-        'congestion': ['congestion', 'stuffy nose', 'runny nose', 'nasal congestion'],
-        'sore throat': ['sore throat', 'throat pain', 'throat ache', 'painful throat'],
-        'rash': ['rash', 'skin rash', 'spots', 'skin spots', 'hives'],
-        'swelling': ['swelling', 'swollen', 'inflammation', 'inflamed'],
-        'itching': ['itching', 'itchy', 'itches', 'scratching'],
-        'chills': ['chills', 'shivering', 'shiver', 'cold chills'],
-        'hair fall': ['hair fall', 'hair loss', 'hair falling', 'baldness', 'falling hair'],
-        'knee knock': ['knee knock', 'knee knocking', 'knee issue', 'knee problem', 'knock knees'],
-        'back pain': ['back pain', 'backache', 'lower back pain', 'upper back pain', 'back ache', 'backpain'],
-        'chest pain': ['chest pain', 'chest ache', 'heart pain'],
-        'shoulder pain': ['shoulder pain', 'shoulder ache', 'shoulder pain'],
-        'hand pain': ['hand pain', 'hand ache', 'pain in hand', 'hand hurts'],
-        'arm pain': ['arm pain', 'arm ache', 'pain in arm'],
-        'leg pain': ['leg pain', 'leg ache', 'pain in leg'],
-        'joint pain': ['joint pain', 'joint ache', 'joints hurt', 'arthritis'],
-        'acne': ['acne', 'pimples', 'acne breakout', 'spots on face'],
-        'skin rash': ['skin rash', 'rash', 'skin eruption'],
-        'constipation': ['constipation', 'constipated', 'difficulty in bowel'],
-        'indigestion': ['indigestion', 'acid reflux', 'bloating', 'gas'],
-        'stomach pain': ['stomach pain', 'stomach ache', 'abdominal pain', 'belly pain'],
-        'vomiting': ['vomiting', 'vomit', 'throwing up', 'retching'],
-        'breathlessness': ['breathlessness', 'shortness of breath', 'difficulty breathing', 'breathless'],
-        'cough variant': ['cough', 'dry cough', 'persistent cough'],
-        'snoring': ['snoring', 'snore', 'snores'],
-        'sleeplessness': ['sleeplessness', 'insomnia', 'can not sleep', 'unable to sleep'],
-        'dizziness': ['dizziness', 'dizzy', 'vertigo', 'lightheaded'],
-        'eye pain': ['eye pain', 'eye ache', 'pain in eyes'],
-        'ear pain': ['ear pain', 'ear ache', 'earache'],
-        'tooth pain': ['tooth pain', 'tooth ache', 'toothache'],
-        'nosebleed': ['nosebleed', 'nose bleeding', 'bloody nose'],
-        'bleeding': ['bleeding', 'bleed', 'bleeds'],
-        'bruising': ['bruising', 'bruises', 'black and blue', 'contusion'],
-        'numbness': ['numbness', 'numb', 'feel numb'],
-        'tingling': ['tingling', 'pins and needles', 'prickling'],
-        'tremor': ['tremor', 'trembling', 'shaking', 'tremors'],
-        'weakness': ['weakness', 'weak', 'feeling weak'],
-        'loss of appetite': ['loss of appetite', 'no appetite', 'not hungry'],
-        'excessive hunger': ['excessive hunger', 'always hungry', 'hunger'],
-        'excessive thirst': ['excessive thirst', 'very thirsty', 'constant thirst'],
-        'frequent urination': ['frequent urination', 'urinating frequently', 'pee often'],
-        'weight loss': ['weight loss', 'losing weight', 'lost weight'],
-        'weight gain': ['weight gain', 'gaining weight', 'gained weight'],
-        'mood swings': ['mood swings', 'mood changes', 'emotional changes', 'stress', 'feeling stress', 'stressed', 'stressed out'],
-        'anxiety': ['anxiety', 'anxious', 'nervous', 'stress'],
-        'depression': ['depression', 'depressed', 'sad', 'sadness'],
-        'confusion': ['confusion', 'confused', 'disorientation'],
-        'memory loss': ['memory loss', 'forgetfulness', 'forgetting', 'forgetful'],
-        'high blood pressure': ['high blood pressure', 'high bp', 'hypertension'],
-        'low blood pressure': ['low blood pressure', 'low bp', 'hypotension'],
-        'heart palpitations': ['heart palpitations', 'palpitations', 'racing heart', 'heart racing'],
-        'irregular heartbeat': ['irregular heartbeat', 'irregular pulse', 'arrhythmia'],
-        'skin dryness': ['skin dryness', 'dry skin', 'skin is dry'],
-        'skin oiliness': ['skin oiliness', 'oily skin', 'skin is oily'],
-        'dandruff': ['dandruff', 'scalp flaking'],
-    }
-    
-    # Extract symptoms from phrases
-    for symptom_key, keywords in phrases.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                # Find best matching symptom from training data
-                for symptom in symptom_list:
-                    symptom_normalized = symptom.replace('_', ' ').lower()
-                    if (symptom_key.replace(' ', '_').lower() in symptom.lower() or 
-                        symptom_normalized in symptom_key.lower() or
-                        symptom_key.lower() in symptom_normalized):
-                        if symptom not in extracted_symptoms:
-                            extracted_symptoms.append(symptom)
-                        break
-    
-    # If no symptoms extracted via phrases, try direct matching
-    if not extracted_symptoms:
-        for symptom in symptom_list:
-            symptom_clean = symptom.replace('_', ' ').lower()
-            if symptom_clean in text_lower or text_lower in symptom_clean:
-                extracted_symptoms.append(symptom)
-    
-    return extracted_symptoms
+    extracted_symptoms = knowledge.current.extract_symptoms(text, typos)
+    return [s for s in extracted_symptoms if s in symptom_list]
 
 def check_pattern(dis_list, inp):
     """Check pattern matching for symptoms"""
@@ -263,8 +256,9 @@ def sec_predict(symptoms_exp):
     X = df.iloc[:, :-1]
     y = df['prognosis']
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=20)
+    X_train_u, y_train_u, w_train_u = compress_rows(X_train, y_train)
     rf_clf = DecisionTreeClassifier()
-    rf_clf.fit(X_train, y_train)
+    rf_clf.fit(X_train_u, y_train_u, sample_weight=w_train_u)
 
     symptoms_dict_local = {symptom: index for index, symptom in enumerate(X)}
     input_vector = np.zeros(len(symptoms_dict_local))
@@ -273,24 +267,32 @@ def sec_predict(symptoms_exp):
 
     return rf_clf.predict([input_vector])
 
+def symptom_vector(symptoms):
+    """0/1 input row over the served model's symptom columns"""
+    row = np.zeros(len(model_cols))
+    for symptom in symptoms:
+        if symptom in model_index:
+            row[model_index[symptom]] = 1
+    return row
+
 def print_disease(node):
     """Extract disease from tree node"""
     node = node[0]
     val = node.nonzero()
-    disease = le.inverse_transform(val[0])
+    disease = class_labels[val[0]]
     return list(map(lambda x: x.strip(), list(disease)))
 
 def get_precautions_for_disease(disease_name):
     """Get precautions for a disease, with case-insensitive matching"""
     # Try exact match first
     if disease_name in precautionDictionary:
-        return precautionDictionary[disease_name]
+        return list(precautionDictionary[disease_name])
     
     # Try case-insensitive match
     disease_lower = disease_name.lower().strip()
     for prec_disease, precautions in precautionDictionary.items():
         if prec_disease.lower().strip() == disease_lower:
-            return precautions
+            return list(precautions)
     
     # If no match found, return empty list
     return []
@@ -370,18 +372,298 @@ def derive_common_treatments(disease_name):
     return informative
 
 # ==================== INITIALIZE DATA ====================
-getSeverityDict()
-getDescription()
-getprecautionDict()
+severityDictionary = MappingProxyType(getSeverityDict())
+description_list = MappingProxyType(getDescription())
+precautionDictionary = MappingProxyType(getprecautionDict())
 
 chk_dis = ",".join(cols).split(",")
 
+# Ranked disease-name lookup over class names, aliases and description words
+disease_index = DiseaseIndex(class_labels, load_aliases(), description_list)
+
+# Disease x disease symptom-profile similarity and nearest neighbours
+disease_similarity = DiseaseSimilarity(disease_symptoms, list(cols))
+
+def model_digest(tree, columns):
+    """Short fingerprint of a flat tree and its input columns"""
+    h = hashlib.sha256(','.join(columns).encode())
+    for arr in (tree.feature, tree.threshold, tree.value):
+        h.update(arr.tobytes())
+    return h.hexdigest()[:12]
+
+# Identifies the served model; cached pages and payloads are keyed on it
+MODEL_VERSION = model_digest(served_tree, model_cols)
+
+def holdout_accuracy(model, columns):
+    """Accuracy of a tree on Testing.csv"""
+    return round(float(np.mean(model.predict(testing[columns]) == testy)), 4)
+
+# Process RSS and (optional) tracemalloc allocation sites for /api/admin/memory
+memory_tracker = MemoryTracker()
+
+# Loaded model versions: diagnose picks one per request by traffic share and
+# can shadow-score a candidate off the request path
+registry = ModelRegistry()
+registry.register(ModelVersion(
+    'v1', served_tree, model_cols, accuracy=served_accuracy,
+    description=f'startup model {MODEL_VERSION}'), primary=True)
+
+def refit_online_model(x, y, w):
+    """Fit a tree on the learner's compact rows and promote it if it is no worse
+
+    A tree with lower Testing.csv accuracy than the primary becomes the shadow
+    candidate instead, replacing the previous online candidate. A shadow an
+    admin set through /api/admin/models/routing is left alone and the tree
+    is discarded.
+    """
+    model = fit_compact(pd.DataFrame(x, columns=model_cols), y, w, model_cols, max_depth=COMPACT_MAX_DEPTH)
+    if len(model.classes_) != len(class_labels):
+        raise ValueError('Refit rows do not cover every disease')
+    version = ModelVersion(
+        f'online-{online.refits + 1}', FlatTree.from_sklearn(model), model_cols,
+        accuracy=holdout_accuracy(model, model_cols),
+        description=f'refit with {online.observed} confirmed cases')
+    current = registry.get(registry.primary)
+    if current is None or current.accuracy is None or version.accuracy >= current.accuracy:
+        previous = registry.primary if registry.primary.startswith('online-') else None
+        return registry.promote(version, retire=previous)
+    candidate = registry.shadow_name
+    if candidate is not None and not candidate.startswith('online-'):
+        logging.warning('Refit %s scored %.4f against %.4f for %s; discarded, shadow %s is in use',
+                        version.name, version.accuracy, current.accuracy, current.name, candidate)
+        return version
+    registry.register(version)
+    registry.set_routing(shadow=version.name)
+    registry.retire(candidate)
+    logging.warning('Refit %s scored %.4f against %.4f for %s; kept as shadow candidate',
+                    version.name, version.accuracy, current.accuracy, current.name)
+    return version
+
+# Reviewed outcomes from /api/diagnose_followup update symptom x disease count
+# tables (and the Naive Bayes model over them) at once, and the served tree
+# through a periodic background refit. Needs the training rows, so not lean
+LEARNED_CASES = os.environ.get('MEDICHAT_LEARNED_CASES') or os.path.join(BASE_DIR, 'learned_cases.jsonl')
+REVIEW_QUEUE = os.environ.get('MEDICHAT_REVIEW_QUEUE') or os.path.join(BASE_DIR, 'review_queue.json')
+REFIT_SECONDS = float(os.environ.get('MEDICHAT_REFIT_SECONDS') or 600)
+online = None
+if not LEAN:
+    online = OnlineLearner(cols, class_labels, log_path=LEARNED_CASES, review_path=REVIEW_QUEUE)
+    online.seed(x_train_u.to_numpy(), y_train_u, w_train)
+    online.replay()
+    online.load_review_queue()
+    if REFIT_SECONDS:
+        online.start_refitter(REFIT_SECONDS, refit_online_model, model_cols)
+
+# Static files fingerprinted and pre-compressed once, served from memory
+assets = AssetStore(os.path.join(BASE_DIR, 'static'))
+_page_cache = {}
+
+# Static API payloads, encoded and compressed once per model version
+symptoms_payload = StaticPayload({'symptoms': list(chk_dis)}, MODEL_VERSION)
+diseases_payload = StaticPayload({'diseases': sorted(d.strip() for d in class_labels)}, MODEL_VERSION)
+
+# Symptom synonyms, Q&A answers and the spelling index, compiled from the
+# JSON knowledge files and hot-swapped on reload
+knowledge = KnowledgeStore(BASE_DIR, chk_dis, class_labels)
+KNOWLEDGE_WATCH_SECONDS = float(os.environ.get('MEDICHAT_KNOWLEDGE_WATCH') or 0)
+if KNOWLEDGE_WATCH_SECONDS:
+    knowledge.start_watcher(KNOWLEDGE_WATCH_SECONDS)
+
+# Admin endpoints require this token (X-Admin-Token header); without one
+# configured they only accept requests from localhost
+ADMIN_TOKEN = os.environ.get('MEDICHAT_ADMIN_TOKEN', '')
+
+# Confirmed diagnoses are only queued for learning when they come from an
+# admin or carry this token (X-Clinician-Token header)
+CLINICIAN_TOKEN = os.environ.get('MEDICHAT_CLINICIAN_TOKEN', '')
+
+# Consultation history: queued in memory, written to SQLite in batches
+HISTORY_DB = os.environ.get('MEDICHAT_HISTORY_DB') or os.path.join(BASE_DIR, 'consultations.db')
+history = ConsultationStore(HISTORY_DB)
+atexit.register(history.close)
+
+# Live aggregate counters and sketches over diagnosis traffic
+analytics = Analytics()
+
+def record_consultation(kind, request_data, response, parent_id=None):
+    """Queue a consultation for persistence and tag the response with its id"""
+    response['consultation_id'] = history.record(kind, request_data, dict(response), parent_id)
+    return response
+
+def queue_confirmed(data, source):
+    """Queue a confirmed follow-up for review by an admin; returns the queued case.
+
+    Symptoms come from the request, or from the diagnosis it follows up.
+    """
+    symptoms = data.get('symptoms')
+    if not isinstance(symptoms, list):
+        parent = history.get(data.get('consultation_id')) if data.get('consultation_id') else None
+        symptoms = ((parent or {}).get('response') or {}).get('symptoms_present') or []
+    disease = str(data.get('disease') or '').strip()
+    return online.submit(symptoms, disease_index.best(disease) or disease, source)
+
+def admin_allowed():
+    """Check the admin token, or localhost when no token is configured"""
+    if ADMIN_TOKEN:
+        return request.headers.get('X-Admin-Token', '') == ADMIN_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def confirmation_source():
+    """Who may confirm a diagnosis for learning: 'clinician', 'admin' or None"""
+    if CLINICIAN_TOKEN and request.headers.get('X-Clinician-Token', '') == CLINICIAN_TOKEN:
+        return 'clinician'
+    if admin_allowed():
+        return 'admin'
+    return None
+
+# On-demand handler profiling: 1-in-N sampling and/or an admin X-Profile
+# header. Wrapped handlers are left untouched when both are off.
+profiler = RequestProfiler(
+    os.environ.get('MEDICHAT_PROFILE_DIR') or os.path.join(BASE_DIR, 'profiles'),
+    sample_every=int(os.environ.get('MEDICHAT_PROFILE_SAMPLE') or 0),
+    allow_header=os.environ.get('MEDICHAT_PROFILE_HEADER') == '1',
+    mode=os.environ.get('MEDICHAT_PROFILE_MODE') or 'sample',
+    keep=int(os.environ.get('MEDICHAT_PROFILE_KEEP') or 200),
+    is_authorized=admin_allowed,
+    get_header=lambda name: request.headers.get(name),
+)
+
+# Per-client rate limits and per-endpoint concurrency limits; saturated
+# endpoints shed load with 429/503 and Retry-After instead of queueing forever
+admission = AdmissionController(
+    client_key=lambda: request.remote_addr,
+    rate=float(os.environ.get('MEDICHAT_RATE_LIMIT') or 10),
+    burst=int(os.environ.get('MEDICHAT_RATE_BURST') or 30),
+)
+
+# Offline text to speech: clips rendered to WAV once per text, one engine
+# per render thread, served from /tts/<name> with immutable caching
+tts = TTSRenderer(
+    os.environ.get('MEDICHAT_TTS_DIR') or os.path.join(BASE_DIR, 'tts_cache'),
+    workers=int(os.environ.get('MEDICHAT_TTS_WORKERS') or 1),
+)
+atexit.register(tts.close)
+
+# Longest free text /api/tts renders; fixed texts are well under this
+MAX_TTS_CHARS = 500
+
+def tts_text(disease, part):
+    """Spoken text for a disease's description or precautions, or None"""
+    if part == 'description':
+        return description_list.get(disease)
+    if part == 'precautions':
+        precautions = [p for p in precautionDictionary.get(disease, []) if p]
+        return f"Precautions: {', '.join(precautions)}." if precautions else None
+    return None
+
+def tts_fixed_texts():
+    """Every description and precaution text, for pre-rendering"""
+    for disease in description_list:
+        if disease == 'Disease':  # CSV header row
+            continue
+        yield tts_text(disease, 'description')
+    for disease in precautionDictionary:
+        yield tts_text(disease, 'precautions')
+
+if os.environ.get('MEDICHAT_TTS_PRERENDER') == '1':
+    tts.prerender(tts_fixed_texts())
+
+def diagnose_symptoms(version, extracted_symptoms):
+    """Walk one model version's tree per symptom and rank the diseases reached.
+
+    Returns (per-symptom predictions, score per disease, top disease).
+    """
+    tree_ = version.model
+
+    # Track predictions from multiple symptoms
+    all_predictions = []
+    all_symptoms_present = set()
+
+    # Process each extracted symptom
+    for symptom_input in extracted_symptoms:
+        # The tree walk for this symptom alone, precomputed per version
+        leaf, symptoms_present = version.path(symptom_input)
+        symptoms_present = list(symptoms_present)
+        present_disease = print_disease(tree_.value[leaf])
+        try:
+            # Ensure we use a single disease label for lookup
+            symptoms_given = disease_symptoms[present_disease[0]]
+        except Exception:
+            symptoms_given = ()
+
+        if present_disease:
+            all_symptoms_present.update(symptoms_present)
+            all_predictions.append({
+                'disease': present_disease[0],
+                'symptoms': symptoms_present,
+                'confidence': len(symptoms_present) / max(len(symptoms_given), 1) if symptoms_given else 0
+            })
+
+    if not all_predictions:
+        return [], {}, None
+
+    # Find most common disease prediction
+    disease_scores = {}
+    for pred in all_predictions:
+        disease = pred['disease']
+        score = pred['confidence']
+        disease_scores[disease] = disease_scores.get(disease, 0) + score
+
+    # Get top disease
+    top_disease = max(disease_scores, key=disease_scores.get)
+    return all_predictions, disease_scores, top_disease
+
 # ==================== FLASK ROUTES ====================
 
+@app.context_processor
+def inject_asset_url():
+    def asset_url(name):
+        hashed = assets.url_name(name)
+        if hashed is None:
+            return url_for('static', filename=name)
+        return url_for('serve_asset', filename=hashed)
+    return {'asset_url': asset_url}
+
+@app.before_request
+def reject_oversized():
+    # Checked from the header so handlers never start reading the body
+    if (request.content_length or 0) > app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+
+@app.after_request
+def compress_json(response):
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve a fingerprinted static file with negotiated compression"""
+    asset = assets.by_hashed.get(filename)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    encoding, body = asset.negotiate(request.headers.get('Accept-Encoding'))
+    etag = f'{asset.digest}-{encoding}'
+    response = Response(status=304) if request.if_none_match.contains(etag) else Response(body, mimetype=asset.mimetype)
+    if encoding != 'identity' and response.status_code == 200:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    response.set_etag(etag)
+    return response
+
 @app.route('/')
 def index():
     """Serve the main web interface"""
-    return render_template('index.html', symptoms=list(cols))
+    # Rendered once per model and asset version (templates reload in debug)
+    key = ('index.html', MODEL_VERSION, assets.version)
+    cached = None if app.debug else _page_cache.get(key)
+    if cached is None:
+        page = render_template('index.html', symptoms=list(cols))
+        cached = (page, hashlib.sha256(page.encode()).hexdigest()[:16])
+        _page_cache[key] = cached
+    response = Response(cached[0], mimetype='text/html')
+    response.set_etag(cached[1])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/api/suggest_symptoms', methods=['POST'])
 def suggest_symptoms():
@@ -390,11 +672,21 @@ def suggest_symptoms():
         data = request.json or {}
         input_text = data.get('text', '').strip()
         conf, cnf_dis = check_pattern(chk_dis, input_text)
+        if not conf and input_text:
+            # Retry with typos corrected, then through the same phrase map
+            # and word-level matches as /api/diagnose
+            engine = knowledge.current
+            corrected = engine.spelling.correct_text(input_text)
+            conf, cnf_dis = check_pattern(chk_dis, corrected)
+            if not conf:
+                cnf_dis = engine.extract_symptoms(corrected)
         return jsonify({'suggestions': cnf_dis})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/diagnose', methods=['POST'])
+@admission.guard('diagnose', limit=8, queue_size=32, queue_timeout=2.0)
+@profiler.wrap
 def diagnose():
     """API endpoint for diagnosis using the decision tree algorithm from chat_bot.py"""
     try:
@@ -411,19 +703,31 @@ def diagnose():
         if not disease_input:
             return jsonify({'error': 'Please enter symptoms or disease'}), 400
 
-        # Extract ALL symptoms from natural language text
-        extracted_symptoms = extract_symptoms_from_text(disease_input, chk_dis)
-        
+        # A named disease is answered directly, before symptom extraction
+        result_disease = disease_index.best(known) if known else None
+
+        # Extract ALL symptoms from natural language text, as written
+        extracted_symptoms = [] if result_disease else extract_symptoms_from_text(disease_input, chk_dis, typos=False)
+        if not extracted_symptoms and not result_disease:
+            result_disease = disease_index.best(disease_input)
+
+        if not result_disease:
+            # Then with misspelled words corrected against the symptom/disease vocabulary
+            corrected = knowledge.current.spelling.correct_text(disease_input)
+            extracted_symptoms += [s for s in extract_symptoms_from_text(corrected, chk_dis)
+                                   if s not in extracted_symptoms]
+            if not extracted_symptoms:
+                result_disease = disease_index.best(corrected)
+
         if not extracted_symptoms:
-            # If no symptoms extracted, try to match as disease name
+            # If no symptoms extracted, answer for the named disease
             try:
-                matches = [d for d in le.classes_ if disease_input.lower() in d.lower()]
-                if matches:
-                    result_disease = matches[0]
+                if result_disease:
                     precautions = get_precautions_for_disease(result_disease)
                     description = description_list.get(result_disease, "No description available")
                     derived = derive_common_treatments(result_disease)
-                    return jsonify({
+                    analytics.record_diagnosis(result_disease, [])
+                    return jsonify(record_consultation('diagnose', data, {
                         'disease': result_disease,
                         'description': description,
                         'precautions': precautions,
@@ -431,92 +735,24 @@ def diagnose():
                         'result_message': f"You asked about {result_disease}",
                         'symptoms_present': [],
                         'confidence': 1.0
-                    })
+                    }))
                 else:
+                    analytics.record_unmatched()
                     return jsonify({'error': 'Please describe your symptoms clearly. Example: "I have fever and cough"'}), 400
             except Exception:
                 return jsonify({'error': 'Please describe your symptoms clearly'}), 400
 
         # ==================== TREE TRAVERSAL FOR MULTIPLE SYMPTOMS ====================
-        tree_ = clf.tree_
-        feature_name = [
-            cols[i] if i != _tree.TREE_UNDEFINED else "undefined!"
-            for i in tree_.feature
-        ]
-
-        # Track predictions from multiple symptoms
-        all_predictions = []
-        all_symptoms_present = set()
-
-        # Process each extracted symptom
-        for symptom_input in extracted_symptoms:
-            symptoms_present = []
-            present_disease = None
-            symptoms_given = []
-
-            # Normalize symptom for matching against tree feature names
-            norm_symptom = str(symptom_input).replace('_', ' ').strip().lower()
-
-            def recurse(node, depth):
-                nonlocal present_disease, symptoms_given, symptoms_present
-
-                if tree_.feature[node] != _tree.TREE_UNDEFINED:
-                    name = feature_name[node]
-                    threshold = tree_.threshold[node]
-
-                    # Normalize feature name for case/underscore-insensitive comparison
-                    name_norm = str(name).replace('_', ' ').strip().lower()
-
-                    # Treat match if normalized names are equal
-                    if name_norm == norm_symptom:
-                        val = 1
-                    else:
-                        val = 0
-
-                    if val <= threshold:
-                        recurse(tree_.children_left[node], depth + 1)
-                    else:
-                        symptoms_present.append(name)
-                        recurse(tree_.children_right[node], depth + 1)
-                else:
-                    present_disease = print_disease(tree_.value[node])
-                    try:
-                        # Ensure we use a single disease label for lookup
-                        pd_key = present_disease[0] if isinstance(present_disease, (list, tuple, np.ndarray)) else present_disease
-                        red_cols = reduced_data.columns
-                        row = reduced_data.loc[pd_key]
-                        # row.values may be 1D or 2D depending on lookup, handle both
-                        vals = row.values
-                        if vals.ndim > 1:
-                            vals = vals[0]
-                        symptoms_given = list(red_cols[np.array(vals).nonzero()[0]])
-                    except Exception:
-                        symptoms_given = []
-
-            # Start tree traversal for this symptom
-            recurse(0, 1)
-            
-            if present_disease:
-                all_symptoms_present.update(symptoms_present)
-                all_predictions.append({
-                    'disease': present_disease[0],
-                    'symptoms': symptoms_present,
-                    'confidence': len(symptoms_present) / max(len(symptoms_given), 1) if symptoms_given else 0
-                })
-
+        version = registry.choose()
+        started = time.perf_counter()
+        all_predictions, disease_scores, top_disease = diagnose_symptoms(version, extracted_symptoms)
+        registry.record(version, time.perf_counter() - started)
         if not all_predictions:
             return jsonify({'error': 'Could not diagnose with given symptoms'}), 400
+        registry.shadow(lambda candidate: diagnose_symptoms(candidate, extracted_symptoms)[2], top_disease, version)
 
-        # Find most common disease prediction
-        disease_scores = {}
-        for pred in all_predictions:
-            disease = pred['disease']
-            score = pred['confidence']
-            disease_scores[disease] = disease_scores.get(disease, 0) + score
-
-        # Get top disease
-        top_disease = max(disease_scores, key=disease_scores.get)
         avg_confidence = disease_scores[top_disease] / len(all_predictions)
+        differential, differential_groups = disease_similarity.rank_differential(disease_scores, top_disease)
 
         description = description_list.get(top_disease, "No description available")
         precautions = get_precautions_for_disease(top_disease)
@@ -531,7 +767,7 @@ def diagnose():
             if other_diseases:
                 result_msg += f" or possibly {', '.join(set(other_diseases))}"
 
-        return jsonify({
+        response = {
             'disease': top_disease,
             'description': description,
             'condition': 'Multiple symptoms detected',
@@ -539,9 +775,20 @@ def diagnose():
             'derived_treatments': derived,
             'result_message': result_msg,
             'symptoms_present': list(extracted_symptoms),
-            'all_possible_diseases': list(disease_scores.keys()),
-            'confidence': avg_confidence
-        })
+            'all_possible_diseases': [d['disease'] for d in differential] + [
+                str(d).strip() for d, score in disease_scores.items() if not score and d != top_disease],
+            'differential': differential,
+            'differential_groups': differential_groups,
+            'confidence': avg_confidence,
+            'model_version': version.name
+        }
+        if forest is not None:
+            votes = forest.votes(symptom_vector(extracted_symptoms)[None, :])[0]
+            response['ensemble'] = {'trees': forest.n_trees, 'votes': forest.vote_counts(votes)}
+        if online is not None:
+            response['naive_bayes'] = online.predict(extracted_symptoms)
+        analytics.record_diagnosis(top_disease, extracted_symptoms)
+        return jsonify(record_consultation('diagnose', data, response))
     
     except ValueError as e:
         return jsonify({'error': 'Invalid input format'}), 400
@@ -551,7 +798,51 @@ def diagnose():
         return jsonify({'error': f'An error occurred during diagnosis. Please try again.'}), 500
 
 
+@app.route('/api/diagnose_batch', methods=['POST'])
+@admission.guard('diagnose_batch', limit=2, queue_size=4, queue_timeout=5.0, rate=1, burst=5)
+def diagnose_batch():
+    """Score many symptom descriptions in one request"""
+    try:
+        data = request.json or {}
+        cases = data.get('cases', [])
+        if not isinstance(cases, list) or not cases:
+            return jsonify({'error': 'Provide a non-empty list of cases'}), 400
+        if len(cases) > MAX_BATCH_CASES:
+            return jsonify({'error': f'At most {MAX_BATCH_CASES} cases per request'}), 400
+
+        symptom_sets = []
+        for case in cases:
+            text = case.get('symptoms', '') if isinstance(case, dict) else case
+            symptom_sets.append(extract_symptoms_from_text(str(text).strip(), chk_dis) if text else [])
+        X = np.array([symptom_vector(s) for s in symptom_sets])
+
+        results = []
+        if forest is not None:
+            votes = forest.votes_parallel(X, ensemble_executor)
+            for symptoms, row in zip(symptom_sets, votes):
+                counts = forest.vote_counts(row) if symptoms else {}
+                results.append({
+                    'symptoms_present': symptoms,
+                    'disease': next(iter(counts), None),
+                    'votes': counts,
+                })
+        else:
+            version = registry.choose()
+            X = np.array([version.vector(s) for s in symptom_sets])
+            predicted = class_labels[version.model.predict(X)]
+            for symptoms, disease in zip(symptom_sets, predicted):
+                results.append({
+                    'symptoms_present': symptoms,
+                    'disease': disease.strip() if symptoms else None,
+                })
+        return jsonify({'results': results})
+    except Exception:
+        logging.error('Batch diagnosis exception:\n%s', traceback.format_exc())
+        return jsonify({'error': 'Batch diagnosis failed'}), 500
+
+
 @app.route('/api/diagnose_followup', methods=['POST'])
+@admission.guard('diagnose_followup')
 def diagnose_followup():
     """Handle follow-up answers and produce final recommendation"""
     try:
@@ -579,22 +870,110 @@ def diagnose_followup():
         precautions = get_precautions_for_disease(result_disease)
         condition = 'Immediate medical attention recommended.' if emergency else 'Follow suggested precautions and consult a doctor if symptoms worsen.'
         result_message = f"Based on your answers, {'seek emergency care' if emergency else 'monitor symptoms and follow precautions'} for {result_disease}."
+        analytics.record_followup(emergency)
+
+        # A diagnosis a clinician or admin confirmed is queued for review
+        # before it becomes a training case
+        learning = None
+        if data.get('confirmed') and online is not None:
+            source = confirmation_source()
+            if source is None:
+                learning = {'status': 'unauthorized'}
+            else:
+                try:
+                    case = queue_confirmed(data, source)
+                    learning = {'status': 'queued', 'case_id': case['id'], 'symptoms': case['symptoms']}
+                except ValueError as e:
+                    logging.info('Confirmed follow-up not queued: %s', e)
+                    learning = {'status': 'invalid', 'error': str(e)}
 
-        return jsonify({
+        return jsonify(record_consultation('followup', data, {
             'disease': result_disease,
             'description': description,
             'precautions': precautions,
             'condition': condition,
-            'result_message': result_message
-        })
+            'result_message': result_message,
+            'learning': learning
+        }, parent_id=data.get('consultation_id')))
     except Exception as e:
         logging.error('Followup error: %s', e)
         return jsonify({'error': 'Follow-up processing failed'}), 500
 
+@app.route('/api/search_disease', methods=['GET'])
+def search_disease():
+    """Type-ahead disease search over names, aliases and description keywords"""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    return jsonify({'query': query, 'results': disease_index.search(query, limit)})
+
+@app.route('/api/related_diseases', methods=['GET'])
+def related_diseases():
+    """Diseases with the most similar symptom profiles"""
+    query = request.args.get('disease', '').strip()
+    metric = request.args.get('metric', 'jaccard')
+    if metric not in METRICS:
+        return jsonify({'error': f'metric must be one of: {", ".join(METRICS)}'}), 400
+    disease = query if query in disease_similarity else disease_index.best(query)
+    if not disease:
+        return jsonify({'error': 'Disease not found'}), 404
+    limit = min(max(request.args.get('limit', 5, type=int), 1), disease_similarity.top_k)
+    return jsonify({
+        'disease': disease.strip(),
+        'metric': metric,
+        'related': disease_similarity.related(disease, limit, metric),
+    })
+
 @app.route('/api/get_symptoms', methods=['GET'])
 def get_symptoms():
     """Get all available symptoms"""
-    return jsonify({'symptoms': list(chk_dis)})
+    return symptoms_payload.response(request)
+
+@app.route('/api/get_diseases', methods=['GET'])
+def get_diseases():
+    """Get all diseases the model can predict"""
+    return diseases_payload.response(request)
+
+@app.route('/api/tts', methods=['POST'])
+@admission.guard('tts', limit=2, queue_size=8, queue_timeout=5.0, rate=2, burst=10)
+def text_to_speech():
+    """Render text, or a disease's description/precautions, to a WAV clip URL"""
+    data = request.json or {}
+    if data.get('disease'):
+        text = tts_text(str(data['disease']).strip(), data.get('part', 'description'))
+        if text is None:
+            return jsonify({'error': 'No text for that disease and part'}), 404
+    else:
+        text = str(data.get('text', '')).strip()
+        if not text:
+            return jsonify({'error': 'Provide text or a disease'}), 400
+        if len(text) > MAX_TTS_CHARS:
+            return jsonify({'error': f'Text is limited to {MAX_TTS_CHARS} characters'}), 400
+    try:
+        wait = min(float(data.get('wait', 5)), 10.0)
+        if not wait >= 0:
+            raise ValueError(wait)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+
+    future = tts.submit(text)
+    url = url_for('serve_tts', name=tts.clip_name(text))
+    try:
+        future.result(timeout=wait)
+    except TTSUnavailable as e:
+        return jsonify({'error': f'Text to speech is not available on this server: {e}'}), 503
+    except Exception:
+        # Still rendering; the clip appears at the URL when done
+        return jsonify({'url': url, 'status': 'pending'}), 202
+    return jsonify({'url': url, 'status': 'ready'})
+
+@app.route('/tts/<name>')
+def serve_tts(name):
+    """Serve a rendered clip; names are content hashes, so never stale"""
+    if not re.fullmatch(r'[0-9a-f]{24}\.wav', name) or not os.path.exists(tts.path(name)):
+        return jsonify({'error': 'Not found'}), 404
+    response = send_file(tts.path(name), mimetype='audio/wav', conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    return response
 
 @app.route('/api/health_qa', methods=['POST'])
 def health_qa():
@@ -603,53 +982,8 @@ def health_qa():
         data = request.json or {}
         question = data.get('question', '').strip().lower()
         
-        # Health knowledge base
-        qa_database = {
-            'fever': 'Fever is a body temperature above 98.6°F (37°C). It\'s usually a sign of infection. Rest, stay hydrated, and take paracetamol if needed. Consult a doctor if fever persists beyond 3 days.',
-            'cough': 'Cough can be dry or productive (with mucus). Common causes: cold, flu, allergies. Remedies: drink water, honey tea, cough syrup. See doctor if it lasts more than 2 weeks.',
-            'headache': 'Headaches can be tension, migraine, or cluster type. Relief: rest, hydration, pain relievers. Avoid stress and triggers. Consult doctor if severe or persistent.',
-            'body pain': 'Body aches are muscle soreness often from flu, stress, or overexertion. Treatment: rest, warm compress, pain relief. Stretch gently and stay hydrated.',
-            'sleep': 'Good sleep is 7-9 hours nightly. Tips: maintain schedule, avoid screens before bed, exercise daily, create dark cool room. Consult doctor for insomnia lasting weeks.',
-            'exercise': 'Adults need 150 min moderate exercise weekly. Benefits: stronger heart, better mood, weight control. Start slow, warm up, cool down. Stay hydrated.',
-            'diet': 'Healthy diet: 50% vegetables/fruits, 25% protein, 25% grains. Drink 8 glasses water daily. Limit sugar, salt, processed foods. Eat balanced meals.',
-            'stress': 'Manage stress: meditation, yoga, deep breathing, exercise, hobbies. Limit caffeine, alcohol. Talk to someone. Chronic stress causes health issues - seek help.',
-            'allergy': 'Allergies are immune overreactions. Symptoms: sneezing, itching, rash. Remedies: antihistamines, avoid triggers, keep area clean. See doctor for severe allergies.',
-            'flu': 'Flu symptoms: fever, body ache, cough, weakness. Prevention: vaccine, hygiene, distance from sick. Treatment: rest, fluids. Consult doctor if severe.',
-            'covid': 'COVID-19 symptoms: fever, cough, loss of taste/smell. Prevention: vaccine, mask, distance. Isolation if positive. Consult doctor if severe.',
-            'diabetes': 'Diabetes: body can\'t regulate blood sugar. Type 1: genetic, needs insulin. Type 2: lifestyle-related, preventable. Monitor blood sugar, diet, exercise.',
-            'blood pressure': 'Normal: <120/80. High BP increases heart disease risk. Reduce salt, exercise, manage stress. Medications available. Check regularly.',
-            'cholesterol': 'Cholesterol types: HDL (good), LDL (bad). High LDL increases heart risk. Lower it: exercise, reduce saturated fats, eat fish, nuts.',
-            'anxiety': 'Anxiety: excessive worry, panic attacks. Coping: breathing exercises, meditation, therapy, exercise. Medications available. Consult mental health professional.',
-            'depression': 'Depression: persistent sadness, loss of interest. Seek help: therapy, counseling, medication. Exercise helps. Crisis: call hotline or go to ER.',
-            'weight loss': 'Safe weight loss: 1-2 lbs weekly. Method: calorie deficit (diet + exercise). 80% diet, 20% exercise. Consult nutritionist for plans.',
-            'weight gain': 'Healthy weight gain: 0.5-1 lb weekly. Eat calorie surplus + protein + strength training. Avoid junk. Consult nutritionist for plan.',
-            'immunity': 'Boost immunity: vitamin C, D, sleep 8h, exercise, hygiene, manage stress, limit alcohol/smoking, balanced diet, probiotics.',
-            'skin': 'Skin health: sunscreen SPF 30+, moisturize, cleanse gently, avoid harsh products, sleep well, hydrate. See dermatologist for persistent issues.',
-            'hair': 'Hair health: protein-rich diet, scalp massage, limit heat styling, trim regularly, use quality shampoo. See doctor if unusual hair loss.',
-            'dental': 'Dental health: brush 2x daily, floss daily, limit sugar, regular checkups. See dentist every 6 months. Whiten only under professional guidance.',
-            'eye': 'Eye health: 20-20-20 rule (every 20 min, look 20ft for 20sec), UV protection, limit screen time, eat leafy greens. Eye exam yearly.',
-            'pregnancy': 'Pregnancy: prenatal care essential. Avoid alcohol, smoking, raw foods. Take folic acid. Regular checkups. Healthy diet & exercise. Talk to OB/GYN.',
-            'periods': 'Menstrual cycle: typically 28 days, 3-7 days bleeding. Normal: light to heavy flow. Irregular: consult doctor. PMS: exercise, diet, rest helps.',
-            'vaccination': 'Vaccines prevent serious diseases. Schedule: childhood vaccines, flu yearly, boosters as needed. Safe, effective, minimal side effects.',
-            'medicine': 'Take medicines as prescribed. Complete course even if better. Don\'t share medicines. Report side effects. Ask pharmacist about interactions.',
-            'addiction': 'Addiction is treatable. Seek help: counseling, support groups, rehab. Prevention: avoid triggers, find healthy coping. Recovery is possible.',
-            'doctor visit': 'Prepare: list symptoms, medications, questions. Be honest about habits. Discuss concerns. Get treatment plan. Follow up.',
-            'emergency': 'Call 911 for: chest pain, difficulty breathing, severe bleeding, loss of consciousness, poisoning. Don\'t delay. Emergency care saves lives.',
-        }
-        
-        # Find best matching answer
-        best_match = None
-        best_score = 0
-        
-        for keyword, answer in qa_database.items():
-            if keyword in question:
-                best_match = answer
-                best_score = 100
-                break
-            elif any(word in question for word in keyword.split()):
-                if len(keyword) > len(best_match or ''):
-                    best_match = answer
-                    best_score = 50
+        engine = knowledge.current
+        best_match = engine.answer(question)
         
         if best_match:
             return jsonify({
@@ -659,268 +993,187 @@ def health_qa():
         else:
             # Generic health response
             return jsonify({
-                'answer': 'General health tip: Maintain healthy lifestyle with balanced diet, regular exercise, 8 hours sleep, stress management, and regular health checkups. For specific medical concerns, consult a healthcare professional.',
+                'answer': engine.qa_default,
                 'type': 'health_qa'
             })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/consultations/<consultation_id>', methods=['GET'])
+def get_consultation(consultation_id):
+    """Look up a recorded diagnosis or follow-up by id (admin: it holds patient details)"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    record = history.get(consultation_id)
+    if record is None:
+        return jsonify({'error': 'Consultation not found'}), 404
+    return jsonify(record)
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Live counts of diagnoses, emergencies, top diseases and symptoms"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    snapshot = analytics.snapshot(top=request.args.get('top', 10, type=int))
+    snapshot['history'] = history.stats()
+    snapshot['knowledge'] = knowledge.current.stats()
+    snapshot['admission'] = admission.stats()
+    snapshot['tts'] = tts.stats()
+    return jsonify(snapshot)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def profiles():
+    """Top functions by cumulative time across captured request profiles"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(profiler.summary())
+
+@app.route('/api/admin/models', methods=['GET', 'POST'])
+def models():
+    """List model versions with latency/agreement stats, or train a new one"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'GET':
+        return jsonify(registry.stats())
+    if LEAN:
+        return jsonify({'error': 'Training data is not loaded in lean serving mode'}), 409
+    data = request.json or {}
+    try:
+        n_features = int(data.get('compact_features') or 0)
+        max_depth = int(data.get('max_depth') or 0) or None
+        name = str(data.get('name') or f'v{len(registry.versions) + 1}')
+        columns = [features[i] for i in indices[:n_features]] if n_features else list(cols)
+        model = fit_compact(x_train_u, y_train_u, w_train, columns, max_depth=max_depth,
+                            random_state=data.get('random_state'))
+        version = registry.register(ModelVersion(
+            name, FlatTree.from_sklearn(model), columns, accuracy=holdout_accuracy(model, columns),
+            description=f'{len(columns)} symptoms, max_depth={max_depth}'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(version.info()), 201
+
+@app.route('/api/admin/models/routing', methods=['POST'])
+def model_routing():
+    """Set the traffic share per version and the shadow version"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.json or {}
+    try:
+        registry.set_routing(weights=data.get('weights'), shadow=data.get('shadow', UNCHANGED))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(registry.stats())
+
+@app.route('/api/admin/online', methods=['GET', 'POST'])
+def online_learning():
+    """Online learner counts, or refit the served tree now (POST)"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if online is None:
+        return jsonify({'error': 'Training data is not loaded in lean serving mode'}), 409
+    if request.method == 'POST':
+        try:
+            version = online.refit(refit_online_model, model_cols)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if version is None:
+            return jsonify({'status': 'unchanged', 'online': online.stats()})
+        status = ('promoted' if registry.primary == version.name
+                  else 'shadow' if registry.shadow_name == version.name else 'discarded')
+        return jsonify({'status': status, 'version': version.info(), 'online': online.stats()}), 201
+    return jsonify({'online': online.stats(), 'primary': registry.primary, 'shadow': registry.shadow_name})
+
+@app.route('/api/admin/online/review', methods=['GET', 'POST'])
+def online_review():
+    """Confirmed cases awaiting review, or approve/reject them by id (POST)"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if online is None:
+        return jsonify({'error': 'Training data is not loaded in lean serving mode'}), 409
+    if request.method == 'GET':
+        return jsonify({'cases': online.pending_review()})
+    data = request.json or {}
+    decisions = {'approve': data.get('approve') or [], 'reject': data.get('reject') or []}
+    if not all(isinstance(ids, list) for ids in decisions.values()):
+        return jsonify({'error': 'approve and reject must be lists of case ids'}), 400
+    result = {'approved': [], 'rejected': [], 'unknown': []}
+    for decision, ids in decisions.items():
+        for case_id in ids:
+            try:
+                online.review(str(case_id), approve=decision == 'approve')
+            except KeyError:
+                result['unknown'].append(case_id)
+                continue
+            result['approved' if decision == 'approve' else 'rejected'].append(case_id)
+    return jsonify({**result, 'online': online.stats()})
+
+@app.route('/api/admin/memory', methods=['GET'])
+def memory():
+    """Worker RSS, loaded heavy libraries and top allocation sites"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.args.get('start') == '1':
+        memory_tracker.start(request.args.get('frames', 1, type=int))
+    if request.args.get('mark') == '1':
+        memory_tracker.mark()
+    group_by = request.args.get('group', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'error': 'group must be lineno, filename or traceback'}), 400
+    report = memory_tracker.report(top=request.args.get('top', 15, type=int), group_by=group_by)
+    report['lean'] = LEAN
+    return jsonify(report)
+
+@app.route('/api/admin/reload_knowledge', methods=['POST'])
+def reload_knowledge():
+    """Recompile the symptom phrase and Q&A files and swap them in"""
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        engine = knowledge.reload()
+        return jsonify({'status': 'reloaded', 'knowledge': engine.stats()})
+    except Exception as e:
+        logging.error('Knowledge reload failed: %s', e)
+        return jsonify({'error': f'Reload failed, still serving version {knowledge.current.version}: {e}'}), 500
+
 @app.errorhandler(404)
 def not_found(e):
     return jsonify({'error': 'Not found'}), 404
 
+@app.errorhandler(413)
+def too_large(e):
+    return jsonify({'error': f'Request body too large (max {app.config["MAX_CONTENT_LENGTH"] // 1024} KB)'}), 413
+
 @app.errorhandler(500)
 def internal_error(e):
     return jsonify({'error': 'Internal server error'}), 500
 
 
 @app.route('/api/download_report', methods=['POST'])
+@admission.guard('download_report', limit=2, queue_size=8, queue_timeout=5.0, rate=1, burst=5)
+@profiler.wrap
 def download_report():
     """Return a downloadable health report as a PDF built from diagnosis JSON."""
     try:
         data = request.json or {}
-        diagnosis = data.get('diagnosis', {})
-        input_text = data.get('input_text', '')
-        treatments = diagnosis.get('treatments', []) or []
-
-        now_dt = datetime.datetime.now()
-        now = now_dt.strftime('%Y-%m-%d %H:%M:%S')
-        timestamp = now_dt.strftime('%Y%m%d_%H%M%S')
-
-        # Patient info (optional)
-        patient_name = (data.get('patient_name') or '').strip()
-        patient_age = data.get('age', '')
-
-        # Logo path (optional) - check static/logo.png
-        logo_path = os.path.join(BASE_DIR, 'static', 'logo.png')
-        logo_exists = os.path.exists(logo_path)
+        try:
+            report = resolve_report(data)
+        except LookupError:
+            return jsonify({'error': 'Consultation not found'}), 404
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
 
-        # If reportlab is available, create PDF in memory, otherwise fallback to plain text
+        # If reportlab is available, create PDF in memory; the other renderer is the fallback
         if HAVE_REPORTLAB:
-            # Try to use Platypus for nicer PDF formatting; fall back to canvas if platypus not available
             try:
-                platypus = importlib.import_module('reportlab.platypus')
-                styles_mod = importlib.import_module('reportlab.lib.styles')
-                table_mod = importlib.import_module('reportlab.platypus.tables')
-                enums = importlib.import_module('reportlab.lib.enums')
-
-                SimpleDocTemplate = getattr(platypus, 'SimpleDocTemplate')
-                Paragraph = getattr(platypus, 'Paragraph')
-                Spacer = getattr(platypus, 'Spacer')
-                Table = getattr(table_mod, 'Table')
-                TableStyle = getattr(table_mod, 'TableStyle')
-
-                getSampleStyleSheet = getattr(styles_mod, 'getSampleStyleSheet')
-                ParagraphStyle = getattr(styles_mod, 'ParagraphStyle')
-
-                styles = getSampleStyleSheet()
-                title_style = ParagraphStyle(
-                    'TitleStyle', parent=styles['Title'], fontSize=18, leading=22, spaceAfter=12
-                )
-                heading_style = ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=12, leading=14, spaceAfter=6)
-                normal_style = ParagraphStyle('Normal', parent=styles['Normal'], fontSize=10, leading=13)
-
-                buffer = io.BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=inch, leftMargin=inch, topMargin=inch, bottomMargin=inch)
-                elements = []
-
-                # Title and metadata (include patient info when available)
-                # If a logo exists, try to include it above the title
-                if logo_exists:
-                    try:
-                        Image = getattr(platypus, 'Image')
-                        img = Image(logo_path, width=60, height=60)
-                        elements.append(img)
-                    except Exception:
-                        pass
-                elements.append(Paragraph(f"{CHATBOT_NAME} - Health Report", title_style))
-                metadata = [
-                    ['Date:', now],
-                    ['Patient:', patient_name or 'N/A'],
-                    ['Age:', str(patient_age) or 'N/A'],
-                    ['Primary Disease:', diagnosis.get('disease', 'N/A')],
-                    ['Confidence:', f"{round(diagnosis.get('confidence', 0) * 100, 2)}%" if isinstance(diagnosis.get('confidence', 0), (int, float)) else str(diagnosis.get('confidence', '0'))]
-                ]
-                table = Table(metadata, colWidths=[110, 350])
-                table.setStyle(TableStyle([
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ]))
-                elements.append(table)
-                elements.append(Spacer(1, 8))
-
-                # Input text
-                if input_text:
-                    elements.append(Paragraph('<b>Input:</b>', heading_style))
-                    elements.append(Paragraph(input_text, normal_style))
-                    elements.append(Spacer(1, 6))
-
-                # Description
-                elements.append(Paragraph('<b>Description</b>', heading_style))
-                elements.append(Paragraph(diagnosis.get('description', 'No description available'), normal_style))
-                elements.append(Spacer(1, 8))
-
-                # Precautions
-                elements.append(Paragraph('<b>Precautions</b>', heading_style))
-                precautions = diagnosis.get('precautions', []) or []
-                if precautions:
-                    for p in precautions:
-                        elements.append(Paragraph(f'• {p}', normal_style))
-                else:
-                    elements.append(Paragraph('• Follow up with a healthcare professional', normal_style))
-                elements.append(Spacer(1, 8))
-
-                # Common Treatments
-                elements.append(Paragraph('<b>Common Treatments</b>', heading_style))
-                if not treatments:
-                    derived = derive_common_treatments(diagnosis.get('disease'))
-                    if derived:
-                        treatments = derived
-
-                if treatments:
-                    for t in treatments:
-                        elements.append(Paragraph(f'• {t}', normal_style))
-                else:
-                    elements.append(Paragraph('• None specified', normal_style))
-                elements.append(Spacer(1, 8))
-
-                # All possible diseases
-                elements.append(Paragraph('<b>All Possible Diseases</b>', heading_style))
-                elements.append(Paragraph(', '.join(diagnosis.get('all_possible_diseases', [])), normal_style))
-
-                # Build PDF
-                doc.build(elements)
-                buffer.seek(0)
-                safe_name = re.sub(r'[^0-9A-Za-z_-]', '', (patient_name or 'patient').replace(' ', '_'))
-                filename = f"{CHATBOT_NAME}_{safe_name}_{timestamp}.pdf"
-                return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
-            except Exception:
-                # If Platypus isn't available or errors, fall back to canvas approach used previously
+                pdf = render_report(report)
+            except Exception as e:
+                logging.warning('%s PDF renderer failed, falling back: %s', PDF_RENDERER, e)
                 try:
-                    buffer = io.BytesIO()
-                    pdf = canvas.Canvas(buffer, pagesize=letter)
-                    width, height = letter
-
-                    margin = 0.7 * inch
-                    x = margin
-                    y = height - margin
-
-                    # Draw logo (if exists) at top-left
-                    if logo_exists:
-                        try:
-                            pdf.drawImage(logo_path, x, y - 60, width=60, height=60)
-                        except Exception:
-                            pass
-
-                    pdf.setFont('Helvetica-Bold', 16)
-                    pdf.drawString(x + (70 if logo_exists else 0), y, f"{CHATBOT_NAME} - Health Report")
-                    y -= 20
-                    pdf.setFont('Helvetica', 9)
-                    pdf.drawString(x + (70 if logo_exists else 0), y, f'Date: {now}')
-                    y -= 14
-                    # Patient details
-                    if patient_name:
-                        pdf.setFont('Helvetica', 10)
-                        pdf.drawString(x + (70 if logo_exists else 0), y, f'Patient: {patient_name}    Age: {patient_age}')
-                        y -= 14
-
-                    if input_text:
-                        pdf.setFont('Helvetica-Bold', 11)
-                        pdf.drawString(x, y, 'Input:')
-                        y -= 12
-                        pdf.setFont('Helvetica', 10)
-                        text = pdf.beginText(x, y)
-                        for line in split_text(input_text, 80):
-                            text.textLine(line)
-                            y -= 12
-                        pdf.drawText(text)
-                        y -= 6
-
-                    pdf.setFont('Helvetica-Bold', 11)
-                    pdf.drawString(x, y, 'Primary Disease:')
-                    pdf.setFont('Helvetica', 11)
-                    pdf.drawString(x + 110, y, diagnosis.get('disease', 'N/A'))
-                    y -= 16
-
-                    pdf.setFont('Helvetica-Bold', 11)
-                    pdf.drawString(x, y, 'Confidence:')
-                    conf = diagnosis.get('confidence', 0)
-                    try:
-                        conf_pct = f"{round(conf * 100, 2)}%"
-                    except Exception:
-                        conf_pct = str(conf)
-                    pdf.setFont('Helvetica', 11)
-                    pdf.drawString(x + 110, y, conf_pct)
-                    y -= 18
-
-                    pdf.setFont('Helvetica-Bold', 11)
-                    pdf.drawString(x, y, 'Symptoms Present:')
-                    pdf.setFont('Helvetica', 10)
-                    symptoms = diagnosis.get('symptoms_present', []) or []
-                    pdf.drawString(x + 130, y, ', '.join(symptoms) if symptoms else 'N/A')
-                    y -= 18
-
-                    pdf.setFont('Helvetica-Bold', 11)
-                    pdf.drawString(x, y, 'Description:')
-                    y -= 12
-                    pdf.setFont('Helvetica', 10)
-                    text = pdf.beginText(x, y)
-                    for line in split_text(diagnosis.get('description', 'No description available'), 90):
-                        text.textLine(line)
-                        y -= 12
-                    pdf.drawText(text)
-                    y -= 8
-
-                    pdf.setFont('Helvetica-Bold', 11)
-                    pdf.drawString(x, y, 'Precautions:')
-                    y -= 12
-                    pdf.setFont('Helvetica', 10)
-                    precautions = diagnosis.get('precautions', []) or []
-                    if precautions:
-                        for p in precautions:
-                            pdf.drawString(x + 8, y, f'- {p}')
-                            y -= 12
-                    else:
-                        pdf.drawString(x + 8, y, '- Follow up with a healthcare professional')
-                        y -= 12
-
-                    y -= 6
-                    pdf.setFont('Helvetica-Bold', 11)
-                    pdf.drawString(x, y, 'Common Treatments:')
-                    y -= 12
-                    pdf.setFont('Helvetica', 10)
-                    if not treatments:
-                        derived = derive_common_treatments(diagnosis.get('disease'))
-                        if derived:
-                            treatments = derived
-
-                    if treatments:
-                        for m in treatments:
-                            pdf.drawString(x + 8, y, f'- {m}')
-                            y -= 12
-                    else:
-                        pdf.drawString(x + 8, y, '- None specified')
-                        y -= 12
-
-                    y -= 6
-                    pdf.setFont('Helvetica-Bold', 11)
-                    pdf.drawString(x, y, 'All Possible Diseases:')
-                    y -= 12
-                    pdf.setFont('Helvetica', 10)
-                    pdf.drawString(x + 8, y, ', '.join(diagnosis.get('all_possible_diseases', [])))
-                    y -= 18
-
-                    pdf.showPage()
-                    pdf.save()
-                    buffer.seek(0)
-                    safe_name = re.sub(r'[^0-9A-Za-z_-]', '', (patient_name or 'patient').replace(' ', '_'))
-                    filename = f"{CHATBOT_NAME}_{safe_name}_{timestamp}.pdf"
-                    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
+                    pdf = fallback_render_report(report)
                 except Exception as e:
                     logging.error('Fallback PDF generation failed: %s', e)
                     return jsonify({'error': 'Failed to generate PDF report'}), 500
+            filename = report_filename(report, timestamp)
+            return send_file(io.BytesIO(pdf), as_attachment=True, download_name=filename, mimetype='application/pdf')
         else:
             # PDF generation is required for this endpoint. Inform the client to install reportlab.
             msg = (
@@ -934,22 +1187,95 @@ def download_report():
         return jsonify({'error': 'Failed to generate report'}), 500
 
 
-def split_text(text, width):
-    """Helper to split long text into chunks for PDF lines."""
-    if not text:
-        return ['']
-    words = text.split()
-    lines = []
-    current = ''
-    for w in words:
-        if len(current) + len(w) + 1 <= width:
-            current = (current + ' ' + w).strip()
-        else:
-            lines.append(current)
-            current = w
-    if current:
-        lines.append(current)
-    return lines
+def resolve_report(data):
+    """Report fields for reports.render_pdf from a request or a stored consultation.
+
+    Raises LookupError for an unknown consultation_id.
+    """
+    diagnosis = data.get('diagnosis', {}) or {}
+    input_text = data.get('input_text', '')
+    age = data.get('age', '')
+
+    # A stored consultation can stand in for the full diagnosis JSON
+    consultation_id = data.get('consultation_id')
+    if consultation_id:
+        record = history.get(consultation_id)
+        if record is None:
+            raise LookupError(consultation_id)
+        diagnosis = record['response'] or {}
+        request_data = record['request'] or {}
+        input_text = input_text or request_data.get('symptoms') or request_data.get('known_disease') or ''
+        age = data.get('age', request_data.get('age', ''))
+
+    treatments = diagnosis.get('treatments', []) or derive_common_treatments(diagnosis.get('disease')) or []
+    logo_path = os.path.join(BASE_DIR, 'static', 'logo.png')
+    return {
+        'diagnosis': diagnosis,
+        'input_text': input_text,
+        'patient_name': (data.get('patient_name') or '').strip(),
+        'age': age,
+        'treatments': treatments,
+        'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'logo_path': logo_path if os.path.exists(logo_path) else None,
+    }
+
+# PDF renderer: 'layout' (precomputed canvas layout, several times faster)
+# or 'platypus'; whichever is not chosen is the fallback
+PDF_RENDERER = os.environ.get('MEDICHAT_PDF_RENDERER') or 'layout'
+if PDF_RENDERER == 'platypus':
+    render_report, fallback_render_report = render_pdf, render_layout_pdf
+else:
+    render_report, fallback_render_report = render_layout_pdf, render_pdf
+
+# Bulk report rendering runs in worker processes, started on first use
+REPORT_WORKERS = int(os.environ.get('MEDICHAT_REPORT_WORKERS') or os.cpu_count() or 1)
+_report_pool = None
+_report_pool_lock = threading.Lock()
+
+def report_pool():
+    """The report worker pool, or None to render on the request thread"""
+    global _report_pool
+    with _report_pool_lock:
+        if _report_pool is None:
+            try:
+                # Starts every worker now, so a platform that cannot run one fails here
+                pool = process_pool(REPORT_WORKERS)
+                atexit.register(pool.shutdown)
+                _report_pool = pool
+            except Exception as e:
+                logging.warning('Report worker processes unavailable, rendering in-thread: %s', e)
+                _report_pool = False
+        return _report_pool or None
+
+@app.route('/api/download_reports', methods=['POST'])
+@admission.guard('download_reports', limit=1, queue_size=2, queue_timeout=5.0, rate=0.2, burst=2)
+def download_reports():
+    """Stream many PDF reports as one ZIP, rendered in parallel"""
+    if not HAVE_REPORTLAB:
+        return jsonify({'error': 'PDF generation is not available on this server. Install with `pip install reportlab`'}), 501
+    data = request.json or {}
+    entries = data.get('reports', [])
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'error': 'Provide a non-empty list of reports'}), 400
+    if len(entries) > MAX_BULK_REPORTS:
+        return jsonify({'error': f'At most {MAX_BULK_REPORTS} reports per request'}), 400
+
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    jobs, errors = [], []
+    for i, entry in enumerate(entries, 1):
+        entry = entry if isinstance(entry, dict) else {'consultation_id': str(entry)}
+        try:
+            report = resolve_report(entry)
+        except LookupError:
+            errors.append((f'#{i}', f'consultation {entry.get("consultation_id")} not found'))
+            continue
+        jobs.append((f'{i:04d}_{report_filename(report, timestamp)}', report))
+
+    chunks = stream_zip(render_all(jobs, report_pool(), max_in_flight=2 * REPORT_WORKERS, render=render_report), errors)
+    response = Response(chunks, mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{CHATBOT_NAME}_reports_{timestamp}.zip"'
+    return response
+
 
 if __name__ == '__main__':
     logging.info('HealthCare ChatBot Starting...')
@@ -0,0 +1,258 @@
+"""ASGI entry point serving the same Flask routes from an event loop.
+
+    uvicorn asgi:application --timeout-keep-alive 75
+    python asgi.py                      # same, via uvicorn.run()
+
+Idle keep-alive connections then cost the event loop a socket each instead
+of holding a server thread. Each request is translated to a WSGI call on
+``app.app``, so routes and JSON contracts are unchanged:
+
+* an allowlist of cheap in-memory routes (symptom/disease lists, static
+  assets, disease search) runs inline on the event loop
+* every other route runs on a thread pool, and its response body is
+  streamed back chunk by chunk from it, so a slow handler (diagnosis,
+  reports, SQLite reads, admin snapshots) never stalls other connections
+* the heavy routes (reports, speech, batch diagnosis) get a pool of their
+  own: their admission guards can hold a thread for seconds while a
+  request waits in the queue, and a surge of them must not take the
+  threads that diagnosis needs
+
+Request bodies are read asynchronously before a worker is involved.
+Declared bodies over ``MAX_CONTENT_LENGTH`` are refused with 413 unread, a
+malformed Content-Length with 400, and a request whose client disconnects
+mid-body is dropped.
+"""
+import asyncio
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import app as flask_app
+
+# Routes cheap enough to run on the event loop; everything else is offloaded
+INLINE_ROUTES = frozenset({
+    '/',
+    '/api/get_symptoms',
+    '/api/get_diseases',
+    '/api/search_disease',
+    '/api/related_diseases',
+})
+INLINE_PREFIXES = ('/assets/',)
+
+# Guarded routes with long admission queues, run on their own pool
+HEAVY_ROUTES = frozenset({
+    '/api/diagnose_batch',
+    '/api/tts',
+    '/api/download_report',
+    '/api/download_reports',
+})
+
+_TOO_LARGE = b'{"error":"Request body too large"}'
+_BAD_LENGTH = b'{"error":"Invalid Content-Length header"}'
+
+
+class _Rejected(Exception):
+    """The request body was refused before reaching the app."""
+
+    def __init__(self, status, body):
+        super().__init__(status)
+        self.status = status
+        self.body = body
+
+
+class _Disconnected(Exception):
+    """The client went away before sending the whole body."""
+
+
+def _latin1(value):
+    return value.encode('utf-8').decode('latin-1')
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope and its (already read) body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': _latin1(scope.get('root_path', '')),
+        'PATH_INFO': _latin1(scope['path']),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = 'HTTP_' + name
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def start_wsgi(wsgi_app, environ):
+    """Call a WSGI app: (status, headers, body iterable)."""
+    started = {}
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+        return written.append
+
+    result = wsgi_app(environ, start_response)
+    if written:
+        result = [b''.join(written)] + list(result)
+    return started['status'], started['headers'], result
+
+
+class ASGIAdapter:
+    """Serve a WSGI app over ASGI on thread pools, except for allowlisted inline paths."""
+
+    def __init__(self, wsgi_app, inline=(), inline_prefixes=(), heavy=(), max_body=None, threads=8,
+                 heavy_threads=4, shutdown=None):
+        self.wsgi_app = wsgi_app
+        self.inline = frozenset(inline)
+        self.inline_prefixes = tuple(inline_prefixes)
+        self.heavy = frozenset(heavy)
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+        self.heavy_executor = ThreadPoolExecutor(max_workers=heavy_threads, thread_name_prefix='asgi-heavy')
+        self.shutdown = shutdown
+
+    def runs_inline(self, path):
+        return path in self.inline or path.startswith(self.inline_prefixes)
+
+    def executor_for(self, path):
+        """Pool for ``path``, or None when it runs on the event loop."""
+        if self.runs_inline(path):
+            return None
+        return self.heavy_executor if path in self.heavy else self.executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f'Unsupported ASGI scope type: {scope["type"]}')
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                self.heavy_executor.shutdown(wait=True)
+                if self.shutdown:
+                    self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, scope, receive):
+        """The request body; raises _Rejected or _Disconnected."""
+        for name, value in scope.get('headers', []):
+            if name == b'content-length':
+                try:
+                    length = int(value)
+                except ValueError:
+                    raise _Rejected(400, _BAD_LENGTH)
+                if length < 0:
+                    raise _Rejected(400, _BAD_LENGTH)
+                if self.max_body is not None and length > self.max_body:
+                    raise _Rejected(413, _TOO_LARGE)
+        chunks = []
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise _Disconnected()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body is not None and size > self.max_body:
+                raise _Rejected(413, _TOO_LARGE)
+            chunks.append(chunk)
+            more = message.get('more_body', False)
+        return b''.join(chunks)
+
+    async def _http(self, scope, receive, send):
+        try:
+            body = await self._read_body(scope, receive)
+        except _Disconnected:
+            return
+        except _Rejected as e:
+            await send({'type': 'http.response.start', 'status': e.status,
+                        'headers': [(b'content-type', b'application/json'),
+                                    (b'content-length', str(len(e.body)).encode())]})
+            await send({'type': 'http.response.body', 'body': e.body})
+            return
+        environ = build_environ(scope, body)
+        executor = self.executor_for(scope['path'])
+
+        if executor is None:
+            status, headers, result = start_wsgi(self.wsgi_app, environ)
+            try:
+                await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                for chunk in result:
+                    if chunk:
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        loop = asyncio.get_running_loop()
+        status, headers, result = await loop.run_in_executor(executor, start_wsgi, self.wsgi_app, environ)
+        chunks = iter(result)
+        try:
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            while True:
+                chunk = await loop.run_in_executor(executor, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(executor, result.close)
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+application = ASGIAdapter(
+    flask_app.app,
+    inline=INLINE_ROUTES,
+    inline_prefixes=INLINE_PREFIXES,
+    heavy=HEAVY_ROUTES,
+    max_body=flask_app.app.config.get('MAX_CONTENT_LENGTH'),
+    threads=int(os.environ.get('MEDICHAT_ASGI_THREADS') or 8),
+    heavy_threads=int(os.environ.get('MEDICHAT_ASGI_HEAVY_THREADS') or 4),
+    shutdown=flask_app.history.close,
+)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        logging.error('uvicorn not installed; install with `pip install uvicorn` or use `python app.py`')
+        sys.exit(1)
+    logging.info('HealthCare ChatBot (ASGI) starting on http://localhost:8000')
+    uvicorn.run(application, host='127.0.0.1', port=8000, timeout_keep_alive=75)
@@ -0,0 +1,120 @@
+"""Fingerprinted, pre-compressed static assets.
+
+At startup every file in ``static/`` is read once, fingerprinted with a
+content hash (``style.css`` -> ``style.3f2a9c1b7d40.css``) and compressed
+with gzip and, when the optional ``brotli`` package is installed, brotli.
+app.py serves the variants from memory under ``/assets/`` with immutable
+cache headers and ``Accept-Encoding`` negotiation; templates link them via
+``asset_url()``.
+
+``python assets.py`` writes the same variants plus ``manifest.json`` to
+``static/dist/`` for serving from a CDN or reverse proxy.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+
+# Brotli compression (optional)
+try:
+    import brotli
+    HAVE_BROTLI = True
+except Exception:
+    HAVE_BROTLI = False
+
+# Files below this size are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+
+class Asset:
+    """One fingerprinted file and its encoded variants."""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        root, ext = os.path.splitext(name)
+        self.hashed_name = f'{root}.{self.digest}{ext}'
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.variants = {'identity': data}
+        if len(data) >= MIN_COMPRESS_BYTES:
+            self.variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+            if HAVE_BROTLI:
+                self.variants['br'] = brotli.compress(data, quality=11)
+
+    def negotiate(self, accept_encoding):
+        """Pick the smallest variant the client accepts: (encoding, bytes)."""
+        accepted = {part.split(';')[0].strip() for part in (accept_encoding or '').lower().split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+
+class AssetStore:
+    """All static assets, keyed by logical and fingerprinted name."""
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.by_name = {}
+        self.by_hashed = {}
+        for root, dirs, files in os.walk(static_dir):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    asset = Asset(name, f.read())
+                self.by_name[name] = asset
+                self.by_hashed[asset.hashed_name] = asset
+        self.version = hashlib.sha256(
+            ''.join(sorted(a.digest for a in self.by_name.values())).encode()).hexdigest()[:12]
+
+    def url_name(self, name):
+        """Fingerprinted name for ``name``, or None if unknown."""
+        asset = self.by_name.get(name)
+        return asset.hashed_name if asset else None
+
+    def manifest(self):
+        return {name: asset.hashed_name for name, asset in sorted(self.by_name.items())}
+
+    def write(self, out_dir=DIST_DIR):
+        """Write every variant (``x.css``, ``x.css.gz``, ``x.css.br``) and a manifest."""
+        suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+        for asset in self.by_name.values():
+            target = os.path.join(out_dir, asset.hashed_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            for encoding, data in asset.variants.items():
+                with open(target + suffixes[encoding], 'wb') as f:
+                    f.write(data)
+        with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+            json.dump(self.manifest(), f, indent=2)
+        return out_dir
+
+    def report(self):
+        return [
+            {'asset': name, 'file': a.hashed_name,
+             **{encoding: len(data) for encoding, data in a.variants.items()}}
+            for name, a in sorted(self.by_name.items())
+        ]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Fingerprint and pre-compress static assets')
+    parser.add_argument('-o', '--output', default=DIST_DIR)
+    args = parser.parse_args()
+    if not HAVE_BROTLI:
+        logging.warning('brotli not installed; writing gzip only. Install with `pip install brotli`')
+    store = AssetStore()
+    logging.info('Wrote assets to %s', store.write(args.output))
+    for row in store.report():
+        print(json.dumps(row))
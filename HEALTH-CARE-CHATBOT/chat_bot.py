@@ -9,6 +9,7 @@ from sklearn.model_selection import cross_val_score
 from sklearn.svm import SVC
 import csv
 import warnings
+from training_data import compress_rows, compression_report
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 
@@ -34,34 +35,43 @@ testx    = testing[cols]
 testy    = testing['prognosis']  
 testy    = le.transform(testy)
 
+# collapse duplicate rows into unique rows + sample_weight counts
+x_train_u, y_train_u, w_train = compress_rows(x_train, y_train)
+x_test_u, y_test_u, w_test = compress_rows(x_test, y_test)
+print(compression_report(len(x_train), w_train, 'train split'))
+
 
 clf1  = DecisionTreeClassifier()
-clf = clf1.fit(x_train,y_train)
+clf = clf1.fit(x_train_u,y_train_u,sample_weight=w_train)
 # print(clf.score(x_train,y_train))
 # print ("cross result========")
+# CV on the raw rows: folds over unique rows would score each row once
 scores = cross_val_score(clf, x_test, y_test, cv=3)
 # print (scores)
 print (scores.mean())
 
 
 model=SVC()
-model.fit(x_train,y_train)
+model.fit(x_train_u,y_train_u,sample_weight=w_train)
 print("for svm: ")
-print(model.score(x_test,y_test))
+print(model.score(x_test_u,y_test_u,sample_weight=w_test))
 
 importances = clf.feature_importances_
 indices = np.argsort(importances)[::-1]
 features = cols
 
-def readn(nstr):
-    engine = pyttsx3.init()
+_engine = None
 
-    engine.setProperty('voice', "english+f5")
-    engine.setProperty('rate', 130)
+def readn(nstr):
+    # One engine for the whole session; starting the driver is the slow part
+    global _engine
+    if _engine is None:
+        _engine = pyttsx3.init()
+        _engine.setProperty('voice', "english+f5")
+        _engine.setProperty('rate', 130)
 
-    engine.say(nstr)
-    engine.runAndWait()
-    engine.stop()
+    _engine.say(nstr)
+    _engine.runAndWait()
 
 
 severityDictionary=dict()
@@ -140,8 +150,9 @@ def sec_predict(symptoms_exp):
     X = df.iloc[:, :-1]
     y = df['prognosis']
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=20)
+    X_train_u, y_train_u, w_train_u = compress_rows(X_train, y_train)
     rf_clf = DecisionTreeClassifier()
-    rf_clf.fit(X_train, y_train)
+    rf_clf.fit(X_train_u, y_train_u, sample_weight=w_train_u)
 
     symptoms_dict = {symptom: index for index, symptom in enumerate(X)}
     input_vector = np.zeros(len(symptoms_dict))
@@ -0,0 +1,91 @@
+"""Compact model variant trained on the top-N most informative symptoms.
+
+The full tree is fitted on all 132 symptom columns. Ranking columns by
+``feature_importances_`` and refitting on the top N gives a smaller input
+vector and a smaller (optionally depth-capped) tree. app.py serves it when
+``MEDICHAT_COMPACT_FEATURES`` is set.
+
+Run ``python compact_model.py`` to benchmark accuracy on Testing.csv against
+latency and model size for several values of N.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+from training_data import compress_rows
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def top_features(clf, cols, n):
+    """Return the ``n`` columns with the highest importance in ``clf``."""
+    indices = np.argsort(clf.feature_importances_)[::-1]
+    return [cols[i] for i in indices[:n]]
+
+
+def fit_compact(x, y, sample_weight, features, max_depth=None, random_state=None):
+    """Fit a tree on the ``features`` subset of ``x``."""
+    compact = DecisionTreeClassifier(max_depth=max_depth, random_state=random_state)
+    compact.fit(x[features], y, sample_weight=sample_weight)
+    return compact
+
+
+def walk_tree(tree_, row):
+    """Predict the class index for a single dense row by walking the tree."""
+    node = 0
+    while tree_.children_left[node] != -1:
+        if row[tree_.feature[node]] <= tree_.threshold[node]:
+            node = tree_.children_left[node]
+        else:
+            node = tree_.children_right[node]
+    return int(np.argmax(tree_.value[node][0]))
+
+
+def benchmark(sizes, max_depth=None, repeat=2000):
+    """Fit one compact model per N in ``sizes`` and measure it."""
+    training = pd.read_csv(os.path.join(BASE_DIR, 'Training.csv'))
+    testing = pd.read_csv(os.path.join(BASE_DIR, 'Testing.csv'))
+    cols = list(training.columns[:-1])
+    x_u, y_u, w = compress_rows(training[cols], training['prognosis'])
+    full = DecisionTreeClassifier(random_state=0).fit(x_u, y_u, sample_weight=w)
+
+    results = []
+    for n in sizes:
+        n = min(n, len(cols))
+        features = top_features(full, cols, n)
+        model = fit_compact(x_u, y_u, w, features, max_depth=max_depth, random_state=0)
+        test_x = testing[features].to_numpy()
+        accuracy = float(np.mean(model.predict(testing[features]) == testing['prognosis'].to_numpy()))
+
+        rows = [test_x[i % len(test_x)] for i in range(repeat)]
+        start = time.perf_counter()
+        for row in rows:
+            walk_tree(model.tree_, row)
+        latency_us = (time.perf_counter() - start) / repeat * 1e6
+
+        results.append({
+            'n_features': n,
+            'max_depth': max_depth,
+            'accuracy': round(accuracy, 4),
+            'depth': int(model.get_depth()),
+            'nodes': int(model.tree_.node_count),
+            'latency_us': round(latency_us, 2),
+            'model_bytes': len(pickle.dumps(model)),
+            'input_vector_bytes': int(test_x[0].nbytes),
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark compact top-N symptom models')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[8, 16, 32, 48, 64, 96, 132])
+    parser.add_argument('--max-depth', type=int, default=None)
+    args = parser.parse_args()
+    for result in benchmark(args.sizes, args.max_depth):
+        print(json.dumps(result))
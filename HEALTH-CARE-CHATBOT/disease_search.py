@@ -0,0 +1,163 @@
+"""Ranked disease-name search over class names, aliases and descriptions.
+
+``DiseaseIndex`` is built once at model load. Every disease name and alias
+(``disease_aliases.json``, e.g. "TB" or "sugar") is normalized and stored
+under each of its prefixes, and so is every word in it. Description
+keywords are indexed as whole words. A query is answered with a few dict
+probes per query word, however many diseases there are.
+
+Matches are ranked by kind, then by how much of the query they cover:
+
+============  =====  ==========================================
+kind          score  example (query -> disease)
+============  =====  ==========================================
+exact         1.0    "tb" -> Tuberculosis
+prefix        0.8    "hepat" -> Hepatitis B
+word          0.6    "asthma" -> Bronchial Asthma
+description   0.3    "mosquito" -> Malaria
+============  =====  ==========================================
+
+``word`` and ``description`` scores are scaled by the fraction of query
+words that matched, so "tell me about jaundice" still finds Jaundice.
+app.py serves this ranking as ``/api/search_disease``.
+
+``best()`` is stricter, because its answer is used as a diagnosis (the
+``known_disease`` and no-symptom fallbacks in ``/api/diagnose``) and as the
+label of learned cases: the whole query must be a name or alias, or contain
+one as whole words ("i think i have dengue fever"). Prefix and single-word
+matches ("my head" -> Migraine, "fever" -> Dengue) are only suggestions.
+"""
+import json
+import logging
+import os
+import re
+
+from spelling import STOPWORDS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ALIASES_FILE = os.path.join(BASE_DIR, 'disease_aliases.json')
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+SCORES = {'exact': 1.0, 'prefix': 0.8, 'word': 0.6, 'description': 0.3}
+
+# Description words shorter than this are too generic to index
+MIN_KEYWORD_LENGTH = 4
+
+# A name or alias found inside a longer query must be at least this long,
+# so short aliases like "tb" or "bp" only count when they are the whole query
+MIN_CONTAINED_LENGTH = 4
+
+
+def normalize(text):
+    """Lower-case words separated by single spaces."""
+    return ' '.join(TOKEN_RE.findall(str(text).lower()))
+
+
+def load_aliases(path=ALIASES_FILE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class DiseaseIndex:
+    """Prefix and word maps from normalized names and aliases to diseases."""
+
+    def __init__(self, diseases, aliases=None, descriptions=None):
+        # Display name (class label without stray whitespace) per normalized name
+        self.diseases = {}
+        for label in diseases:
+            self.diseases.setdefault(normalize(label), str(label).strip())
+        self._exact = {}     # phrase -> {disease: phrase}
+        self._prefix = {}    # phrase prefix -> {disease: phrase}
+        self._words = {}     # word prefix -> {disease: phrase}
+        self._keywords = {}  # description word -> {disease: None}
+        self._max_words = 0  # words in the longest name or alias
+
+        for key, name in self.diseases.items():
+            self._add_phrase(key, name)
+        for disease, names in (aliases or {}).items():
+            name = self.diseases.get(normalize(disease))
+            if name is None:
+                logging.warning('Disease alias entry for unknown disease %r ignored', disease)
+                continue
+            for alias in names:
+                self._add_phrase(normalize(alias), name)
+        for disease, description in (descriptions or {}).items():
+            name = self.diseases.get(normalize(disease))
+            if name is None:
+                continue
+            for word in TOKEN_RE.findall(str(description).lower()):
+                if len(word) >= MIN_KEYWORD_LENGTH and word not in STOPWORDS:
+                    self._keywords.setdefault(word, {}).setdefault(name, None)
+
+    def _add_phrase(self, phrase, name):
+        if not phrase:
+            return
+        # First phrase wins, so a disease's own name is reported over its aliases
+        self._exact.setdefault(phrase, {}).setdefault(name, phrase)
+        self._max_words = max(self._max_words, phrase.count(' ') + 1)
+        for i in range(1, len(phrase) + 1):
+            self._prefix.setdefault(phrase[:i], {}).setdefault(name, phrase)
+        for word in phrase.split():
+            for i in range(1, len(word) + 1):
+                self._words.setdefault(word[:i], {}).setdefault(name, phrase)
+
+    def search(self, query, limit=10):
+        """Best matches first: ``[{'disease', 'score', 'match', 'matched'}, ...]``."""
+        query = normalize(query)
+        if not query:
+            return []
+        best = {}
+
+        def offer(hits, kind, score):
+            for name, phrase in hits.items():
+                if name not in best or score > best[name]['score']:
+                    best[name] = {'disease': name, 'score': round(score, 3), 'match': kind, 'matched': phrase}
+
+        offer(self._exact.get(query, {}), 'exact', SCORES['exact'])
+        offer(self._prefix.get(query, {}), 'prefix', SCORES['prefix'])
+
+        words = [w for w in query.split() if w not in STOPWORDS] or query.split()
+        for kind, index in (('word', self._words), ('description', self._keywords)):
+            counts, phrases = {}, {}
+            for word in words:
+                for name, phrase in index.get(word, {}).items():
+                    counts[name] = counts.get(name, 0) + 1
+                    phrases.setdefault(name, phrase)
+            for name, count in counts.items():
+                offer({name: phrases[name]}, kind, SCORES[kind] * count / len(words))
+
+        ranked = sorted(best.values(), key=lambda m: (-m['score'], len(m['disease']), m['disease'].lower()))
+        return ranked[:limit]
+
+    def best(self, query, min_length=MIN_CONTAINED_LENGTH):
+        """Disease the query names, or None.
+
+        The query must be a name or alias, or contain one of at least
+        ``min_length`` characters as whole words; the longest one wins.
+        """
+        query = normalize(query)
+        hits = self._exact.get(query)
+        if hits:
+            return next(iter(hits))
+        words = query.split()
+        found = None
+        for i in range(len(words)):
+            for j in range(i + 1, min(len(words), i + self._max_words) + 1):
+                phrase = ' '.join(words[i:j])
+                if len(phrase) >= min_length and phrase in self._exact and (
+                        found is None or len(phrase) > len(found)):
+                    found = phrase
+        return next(iter(self._exact[found])) if found else None
+
+    def stats(self):
+        return {
+            'diseases': len(self.diseases),
+            'phrases': len(self._exact),
+            'prefixes': len(self._prefix),
+            'word_prefixes': len(self._words),
+            'keywords': len(self._keywords),
+        }
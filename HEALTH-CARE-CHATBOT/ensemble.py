@@ -0,0 +1,140 @@
+"""Bagged-tree ensemble compiled into one flat-array forest.
+
+A fitted RandomForestClassifier is flattened into a handful of contiguous
+NumPy arrays (feature, threshold, left, right, leaf class) shared by every
+tree, so a batch is scored by stepping all (row, tree) pairs down one level
+per iteration. Row chunks are evaluated on a thread pool; the NumPy kernels
+release the GIL, so chunks run on separate cores while sharing the arrays.
+
+app.py enables it with ``MEDICHAT_ENSEMBLE_TREES=N``.
+
+Run ``python ensemble.py`` to benchmark batch throughput from 1 to N workers.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def fit_forest(x, y, sample_weight=None, n_estimators=50, random_state=None):
+    """Fit a bagged random forest on (optionally weighted) rows."""
+    forest = RandomForestClassifier(n_estimators=n_estimators, random_state=random_state, n_jobs=-1)
+    return forest.fit(x, y, sample_weight=sample_weight)
+
+
+class FlatForest:
+    """All trees of a forest laid out in shared flat arrays."""
+
+    def __init__(self, feature, threshold, left, right, leaf_class, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_class = leaf_class
+        self.roots = roots
+        self.classes = classes
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_forest(cls, forest, labels=None):
+        """Flatten ``forest``; ``labels`` optionally renames ``forest.classes_``."""
+        features, thresholds, lefts, rights, leaves, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree_ = estimator.tree_
+            is_leaf = tree_.children_left == -1
+            roots.append(offset)
+            # Leaves point at themselves so finished rows stay put
+            own = np.arange(tree_.node_count) + offset
+            features.append(np.where(is_leaf, 0, tree_.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree_.threshold))
+            lefts.append(np.where(is_leaf, own, tree_.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree_.children_right + offset))
+            leaves.append(np.argmax(tree_.value[:, 0, :], axis=1))
+            offset += tree_.node_count
+            max_depth = max(max_depth, estimator.get_depth())
+        return cls(
+            np.concatenate(features).astype(np.intp),
+            np.concatenate(thresholds).astype(np.float64),
+            np.concatenate(lefts).astype(np.intp),
+            np.concatenate(rights).astype(np.intp),
+            np.concatenate(leaves).astype(np.intp),
+            np.asarray(roots, dtype=np.intp),
+            np.asarray(forest.classes_ if labels is None else labels),
+            max_depth,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def votes(self, X):
+        """Return an ``(n_rows, n_trees)`` array of per-tree class indices."""
+        X = np.asarray(X, dtype=np.float64)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_right = X[rows, self.feature[nodes]] > self.threshold[nodes]
+            nodes = np.where(go_right, self.right[nodes], self.left[nodes])
+        return self.leaf_class[nodes]
+
+    def votes_parallel(self, X, executor=None, chunk_rows=512):
+        """Like ``votes`` but with row chunks evaluated on ``executor``."""
+        X = np.asarray(X, dtype=np.float64)
+        if executor is None or len(X) <= chunk_rows:
+            return self.votes(X)
+        chunks = [X[i:i + chunk_rows] for i in range(0, len(X), chunk_rows)]
+        return np.concatenate(list(executor.map(self.votes, chunks)))
+
+    def vote_counts(self, votes_row):
+        """Map class label -> number of trees voting for it, most votes first."""
+        counts = np.bincount(votes_row, minlength=len(self.classes))
+        order = np.argsort(counts)[::-1]
+        return {str(self.classes[i]).strip(): int(counts[i]) for i in order if counts[i]}
+
+
+def benchmark(n_trees=50, rows=20000, max_workers=None):
+    """Batch throughput of the flat forest for 1..max_workers threads."""
+    import pandas as pd
+    from training_data import compress_rows
+
+    training = pd.read_csv(os.path.join(BASE_DIR, 'Training.csv'))
+    cols = training.columns[:-1]
+    x, y, w = compress_rows(training[cols], training['prognosis'])
+    forest = fit_forest(x.to_numpy(), y, w, n_estimators=n_trees, random_state=0)
+    flat = FlatForest.from_forest(forest)
+    X = training[cols].to_numpy()[np.arange(rows) % len(training)]
+
+    expected = forest.predict(X)
+    got = flat.classes[[np.bincount(r, minlength=len(flat.classes)).argmax() for r in flat.votes(X[:500])]]
+    agreement = float(np.mean(got == expected[:500]))
+
+    results = []
+    for workers in range(1, (max_workers or os.cpu_count() or 1) + 1):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            flat.votes_parallel(X[:1024], executor)
+            start = time.perf_counter()
+            flat.votes_parallel(X, executor)
+            elapsed = time.perf_counter() - start
+        results.append({'workers': workers, 'rows_per_sec': round(rows / elapsed)})
+    base = results[0]['rows_per_sec']
+    for r in results:
+        r['speedup'] = round(r['rows_per_sec'] / base, 2)
+    return {'trees': flat.n_trees, 'nodes': len(flat.feature), 'rows': rows,
+            'agreement_with_sklearn': agreement, 'scaling': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark flat-forest batch scoring')
+    parser.add_argument('--trees', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--max-workers', type=int, default=None)
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.trees, args.rows, args.max_workers), indent=2))
@@ -0,0 +1,150 @@
+"""Offline comparison of candidate serving models.
+
+Fits DecisionTree, SVC, Naive Bayes and RandomForest on the deduplicated
+Training.csv rows and measures each on the held-out Testing.csv:
+
+* ``test_accuracy``        accuracy on Testing.csv
+* ``cv_accuracy``          stratified k-fold accuracy on the raw training
+                           rows, with identical rows kept in the same fold
+                           so duplicates count but never leak into the
+                           held-out fold; folds run in parallel on all cores
+* ``latency_us``           median single-row predict latency on a contiguous
+                           NumPy row, as served (no DataFrame overhead)
+* ``batch_rows_per_sec``   throughput of one predict call on a large batch
+* ``model_bytes``          pickled model size
+* ``load_ms``              time to unpickle the model
+
+Usage::
+
+    python evaluate.py                         # writes build/model_report.json
+    python evaluate.py -o - --models tree nb   # print JSON to stdout
+"""
+import argparse
+import json
+import logging
+import os
+import pickle
+import platform
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedGroupKFold, cross_validate
+from sklearn.naive_bayes import BernoulliNB
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+from training_data import compress_rows
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'model_report.json')
+
+CANDIDATES = {
+    'tree': lambda: DecisionTreeClassifier(random_state=0),
+    'svc': lambda: SVC(),
+    'nb': lambda: BernoulliNB(),
+    'forest': lambda: RandomForestClassifier(n_estimators=100, random_state=0),
+}
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def row_groups(x):
+    """Group id per row; identical symptom rows share one."""
+    return pd.util.hash_pandas_object(x, index=False).factorize()[0]
+
+
+def evaluate_model(name, make_model, x, y, w, test_x, test_y, raw_x, raw_y, groups, n_jobs=-1,
+                   latency_samples=200, batch_rows=5000):
+    """Fit and measure one candidate; returns a JSON-serializable dict.
+
+    The model is fit on the compact rows ``x``/``y``/``w``; cross-validation
+    runs on the raw rows, split by ``groups``. Feature matrices are NumPy.
+    """
+    n_splits = min(5, int(pd.Series(groups).groupby(raw_y).nunique().min()))
+    folds = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=0)
+    cv = cross_validate(make_model(), raw_x, raw_y, groups=groups, cv=folds, n_jobs=n_jobs)
+
+    model, fit_s = _timed(make_model().fit, x, y, sample_weight=w)
+    test_accuracy = float(np.mean(model.predict(test_x) == test_y))
+
+    single = [test_x[i % len(test_x)][None, :] for i in range(latency_samples)]
+    latencies = [_timed(model.predict, row)[1] for row in single]
+
+    batch = np.ascontiguousarray(test_x[np.arange(batch_rows) % len(test_x)])
+    _, batch_s = _timed(model.predict, batch)
+
+    blob = pickle.dumps(model)
+    _, load_s = _timed(pickle.loads, blob)
+
+    return {
+        'model': name,
+        'test_accuracy': round(test_accuracy, 4),
+        'cv_accuracy': round(float(np.mean(cv['test_score'])), 4),
+        'cv_folds': n_splits,
+        'fit_ms': round(fit_s * 1000, 2),
+        'latency_us': round(statistics.median(latencies) * 1e6, 1),
+        'batch_rows_per_sec': round(batch_rows / batch_s),
+        'model_bytes': len(blob),
+        'load_ms': round(load_s * 1000, 3),
+    }
+
+
+def recommend(results):
+    """Pick the most accurate model, breaking ties by single-row latency."""
+    best = min(results, key=lambda r: (-r['test_accuracy'], -r['cv_accuracy'], r['latency_us']))
+    return best['model']
+
+
+def run(models=None, n_jobs=-1):
+    training = pd.read_csv(os.path.join(BASE_DIR, 'Training.csv'))
+    testing = pd.read_csv(os.path.join(BASE_DIR, 'Testing.csv'))
+    cols = training.columns[:-1]
+    x, y, w = compress_rows(training[cols], training['prognosis'])
+    raw_x = training[cols].to_numpy(dtype=np.float64)
+    raw_y = training['prognosis'].to_numpy()
+    groups = row_groups(training[cols])
+    x = x.to_numpy(dtype=np.float64)
+    test_x = np.ascontiguousarray(testing[cols].to_numpy(dtype=np.float64))
+    test_y = testing['prognosis'].to_numpy()
+
+    results = []
+    for name in models or list(CANDIDATES):
+        logging.info('Evaluating %s...', name)
+        results.append(evaluate_model(name, CANDIDATES[name], x, y, w, test_x, test_y,
+                                      raw_x, raw_y, groups, n_jobs=n_jobs))
+    return {
+        'generated': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'train_rows': len(training),
+        'train_unique_rows': len(x),
+        'test_rows': len(testing),
+        'results': results,
+        'recommended': recommend(results),
+    }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Compare candidate serving models')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="report path, or '-' for stdout")
+    parser.add_argument('--models', nargs='+', choices=list(CANDIDATES), default=None)
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel CV workers (-1 = all cores)')
+    args = parser.parse_args()
+
+    report = run(args.models, args.jobs)
+    text = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text)
+        logging.info('Wrote %s (recommended: %s)', args.output, report['recommended'])
@@ -0,0 +1,162 @@
+"""Export the fitted decision tree as a standalone Python module.
+
+The generated module has no imports beyond the standard library: the tree is
+emitted as flat lookup tables (or nested branches with ``--style branches``)
+keyed by symptom ids, together with the label, description, precaution,
+severity and disease-profile tables. Serving workers that only need to
+evaluate the tree can import it in milliseconds instead of loading
+scikit-learn, pandas and SciPy.
+
+Usage::
+
+    python export_model.py                      # writes build/medichat_model.py
+    python export_model.py -o worker_model.py --style branches
+"""
+import argparse
+import datetime
+import logging
+import os
+import pprint
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'build', 'medichat_model.py')
+
+# CPython's tokenizer refuses more than 100 indentation levels
+MAX_BRANCH_DEPTH = 90
+
+_HEADER = '''"""Standalone {name} diagnosis model (generated by export_model.py).
+
+Generated {date} from a tree with {nodes} nodes, {n_features} symptoms
+and {n_classes} diseases. Do not edit by hand; re-run export_model.py.
+"""
+
+'''
+
+_TABLE_RUNTIME = '''
+
+def _leaf(present):
+    node = 0
+    path = []
+    while _FEATURE[node] >= 0:
+        if _FEATURE[node] in present:
+            path.append(FEATURES[_FEATURE[node]])
+            node = _RIGHT[node]
+        else:
+            node = _LEFT[node]
+    return _LEAF_CLASS[node], path
+'''
+
+_RUNTIME = '''
+
+def _ids(symptoms):
+    return {FEATURE_INDEX[s] for s in symptoms if s in FEATURE_INDEX}
+
+
+def predict(symptoms):
+    """Return ``(disease, symptoms_on_path)`` for an iterable of symptom names."""
+    class_id, path = _leaf(_ids(symptoms))
+    return CLASSES[class_id], path
+
+
+def describe(disease):
+    """Return description, precautions and known symptoms for ``disease``."""
+    return {
+        'disease': disease,
+        'description': DESCRIPTIONS.get(disease, 'No description available'),
+        'precautions': list(PRECAUTIONS.get(disease, ())),
+        'symptoms': list(PROFILES.get(disease, ())),
+    }
+'''
+
+
+def _table(name, value):
+    return f'{name} = {pprint.pformat(value, width=100, compact=True)}\n'
+
+
+def _leaf_classes(tree_):
+    return [int(np.argmax(v[0])) for v in tree_.value]
+
+
+def _emit_branches(tree_, leaf_class):
+    """Emit ``_leaf`` as nested if/else branches on symptom ids."""
+    lines = ['', '', 'def _leaf(present):', '    path = []']
+
+    def recurse(node, depth):
+        indent = '    ' * depth
+        feature = int(tree_.feature[node])
+        if feature < 0:
+            lines.append(f'{indent}return {leaf_class[node]}, path')
+            return
+        lines.append(f'{indent}if {feature} in present:')
+        lines.append(f'{indent}    path.append(FEATURES[{feature}])')
+        recurse(int(tree_.children_right[node]), depth + 1)
+        lines.append(f'{indent}else:')
+        recurse(int(tree_.children_left[node]), depth + 1)
+
+    recurse(0, 1)
+    return '\n'.join(lines) + '\n'
+
+
+def render_module(clf, feature_names, classes, descriptions, precautions, severity, profiles, style='tables'):
+    """Return the source of a standalone module evaluating ``clf``.
+
+    The tree must have been fitted on 0/1 symptom columns so that every split
+    reads as "symptom present / absent".
+    """
+    tree_ = clf.tree_
+    leaf_class = _leaf_classes(tree_)
+    if style == 'branches' and clf.get_depth() > MAX_BRANCH_DEPTH:
+        logging.warning('Tree depth %d too deep for nested branches; using tables', clf.get_depth())
+        style = 'tables'
+
+    parts = [_HEADER.format(
+        name='MediChat',
+        date=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        nodes=tree_.node_count,
+        n_features=len(feature_names),
+        n_classes=len(classes),
+    )]
+    parts.append(_table('FEATURES', tuple(str(f) for f in feature_names)))
+    parts.append('FEATURE_INDEX = {name: i for i, name in enumerate(FEATURES)}\n')
+    parts.append(_table('CLASSES', tuple(str(c).strip() for c in classes)))
+    parts.append(_table('DESCRIPTIONS', {str(k): str(v) for k, v in descriptions.items()}))
+    parts.append(_table('PRECAUTIONS', {str(k): tuple(v) for k, v in precautions.items()}))
+    parts.append(_table('SEVERITY', {str(k): int(v) for k, v in severity.items()}))
+    parts.append(_table('PROFILES', {str(k): tuple(v) for k, v in profiles.items()}))
+
+    if style == 'branches':
+        parts.append(_emit_branches(tree_, leaf_class))
+    else:
+        parts.append(_table('_FEATURE', tuple(int(f) if f >= 0 else -1 for f in tree_.feature)))
+        parts.append(_table('_LEFT', tuple(int(n) for n in tree_.children_left)))
+        parts.append(_table('_RIGHT', tuple(int(n) for n in tree_.children_right)))
+        parts.append(_table('_LEAF_CLASS', tuple(leaf_class)))
+        parts.append(_TABLE_RUNTIME)
+    parts.append(_RUNTIME)
+    return ''.join(parts)
+
+
+def export(output=DEFAULT_OUTPUT, style='tables'):
+    """Export the model served by app.py to ``output``."""
+    import app
+
+    source = render_module(
+        app.clf, app.model_cols, app.le.classes_, app.description_list,
+        app.precautionDictionary, app.severityDictionary,
+        {disease.strip(): symptoms for disease, symptoms in app.disease_symptoms.items()}, style=style,
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(source)
+    logging.info('Wrote %s (%d bytes, %s)', output, len(source), style)
+    return output
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the diagnosis tree as a standalone module')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--style', choices=['tables', 'branches'], default='tables')
+    args = parser.parse_args()
+    export(args.output, args.style)
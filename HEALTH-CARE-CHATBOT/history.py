@@ -0,0 +1,149 @@
+"""Write-behind consultation history backed by SQLite.
+
+Request handlers call ``ConsultationStore.record()``, which only assigns an
+id and puts the record on an in-memory queue. A background writer thread
+drains the queue in batches and inserts them with one prepared
+``executemany`` per batch into a WAL-mode database, so the request path
+never waits on disk. Records that are still queued are served from memory
+by ``get()``.
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS consultations (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    parent_id TEXT,
+    created REAL NOT NULL,
+    payload TEXT NOT NULL
+)
+'''
+INSERT_SQL = 'INSERT OR REPLACE INTO consultations (id, kind, parent_id, created, payload) VALUES (?, ?, ?, ?, ?)'
+SELECT_SQL = 'SELECT id, kind, parent_id, created, payload FROM consultations WHERE id = ?'
+
+_STOP = object()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class ConsultationStore:
+    """Queue consultations in memory and persist them in batches."""
+
+    def __init__(self, path, batch_size=200, flush_interval=0.5, max_pending=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._readers = threading.local()
+        self.written = 0
+        self.dropped = 0
+
+        conn = _connect(path)
+        conn.execute(SCHEMA)
+        conn.commit()
+        conn.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+
+    def record(self, kind, request_data, response, parent_id=None):
+        """Queue a consultation and return its id without touching disk.
+
+        Returns None when the queue is full and the record was dropped.
+        """
+        record = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'parent_id': parent_id,
+            'created': time.time(),
+            'request': request_data,
+            'response': response,
+        }
+        with self._pending_lock:
+            self._pending[record['id']] = record
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on persistence
+            with self._pending_lock:
+                self._pending.pop(record['id'], None)
+            self.dropped += 1
+            logging.warning('Consultation history queue full; record not persisted')
+            return None
+        return record['id']
+
+    def get(self, consultation_id):
+        """Return a recorded consultation, or None."""
+        with self._pending_lock:
+            record = self._pending.get(consultation_id)
+        if record is not None:
+            return record
+        conn = getattr(self._readers, 'conn', None)
+        if conn is None:
+            conn = self._readers.conn = _connect(self.path)
+        row = conn.execute(SELECT_SQL, (consultation_id,)).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[4])
+        return {'id': row[0], 'kind': row[1], 'parent_id': row[2], 'created': row[3],
+                'request': payload.get('request'), 'response': payload.get('response')}
+
+    def stats(self):
+        return {'pending': self._queue.qsize(), 'written': self.written, 'dropped': self.dropped}
+
+    def close(self, timeout=5.0):
+        """Flush everything queued and stop the writer."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [r for r in batch if r is not _STOP]
+            if batch:
+                self._flush(conn, batch)
+        conn.close()
+
+    def _flush(self, conn, batch):
+        rows = [
+            (r['id'], r['kind'], r['parent_id'], r['created'],
+             json.dumps({'request': r['request'], 'response': r['response']}, default=str))
+            for r in batch
+        ]
+        try:
+            with conn:
+                conn.executemany(INSERT_SQL, rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            self.dropped += len(rows)
+            logging.error('Failed to persist %d consultations: %s', len(rows), e)
+        with self._pending_lock:
+            for r in batch:
+                self._pending.pop(r['id'], None)
@@ -0,0 +1,150 @@
+"""Hot-reloadable symptom synonym and health Q&A knowledge.
+
+The phrase table used for symptom extraction (``symptom_phrases.json``) and
+the health Q&A answers (``health_qa.json``) are content, not code. They are
+compiled once into a ``KnowledgeBase``: every synonym keyword is resolved to
+its symptom column up front, the Q&A keywords are pre-split, and the
+spelling index is built over the same vocabulary.
+
+``KnowledgeStore`` holds the live engine. A reload (admin endpoint or file
+watcher) compiles a complete new engine on the caller's thread and then
+swaps a single reference, so in-flight requests keep using the engine they
+started with and never see a half-built one.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from spelling import build_index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PHRASES_FILE = 'symptom_phrases.json'
+QA_FILE = 'health_qa.json'
+
+
+def _resolve_symptom(symptom_key, symptom_list):
+    """First symptom column matching a phrase key (same rule as before)."""
+    key = symptom_key.lower()
+    for symptom in symptom_list:
+        symptom_normalized = symptom.replace('_', ' ').lower()
+        if (key.replace(' ', '_') in symptom.lower() or
+                symptom_normalized in key or
+                key in symptom_normalized):
+            return symptom
+    return None
+
+
+class KnowledgeBase:
+    """Compiled, read-only matcher structures for one version of the files."""
+
+    def __init__(self, phrases, qa, symptom_list, diseases, version=0):
+        self.version = version
+        self.loaded_at = time.time()
+        self.phrases = phrases
+        self.symptom_list = list(symptom_list)
+        # (keyword, symptom) pairs in table order, symptom resolved once
+        self.keyword_symptoms = []
+        for symptom_key, keywords in phrases.items():
+            symptom = _resolve_symptom(symptom_key, self.symptom_list)
+            if symptom is not None:
+                self.keyword_symptoms.extend((keyword.lower(), symptom) for keyword in keywords)
+        self.normalized_symptoms = [(s, s.replace('_', ' ').lower()) for s in self.symptom_list]
+        self.qa_default = qa.get('default', '')
+        self.qa_entries = [(k, k.split(), a) for k, a in qa.get('answers', {}).items()]
+        self.spelling = build_index(self.symptom_list, phrases, diseases)
+
+    @classmethod
+    def from_files(cls, base_dir, symptom_list, diseases, version=0):
+        with open(os.path.join(base_dir, PHRASES_FILE), encoding='utf-8') as f:
+            phrases = json.load(f)
+        with open(os.path.join(base_dir, QA_FILE), encoding='utf-8') as f:
+            qa = json.load(f)
+        return cls(phrases, qa, symptom_list, diseases, version)
+
+    def extract_symptoms(self, text, typos=True):
+        """Symptom columns mentioned in free text.
+
+        With ``typos``, symptom names spelled with small mistakes are added.
+        """
+        extracted = []
+        text_lower = text.lower()
+        for keyword, symptom in self.keyword_symptoms:
+            if keyword in text_lower and symptom not in extracted:
+                extracted.append(symptom)
+
+        # If no symptoms extracted via phrases, try direct matching
+        if not extracted:
+            for symptom, symptom_clean in self.normalized_symptoms:
+                if symptom_clean in text_lower or text_lower in symptom_clean:
+                    extracted.append(symptom)
+
+        # Symptom names written out in full, possibly misspelled
+        if typos:
+            extracted.extend(s for s in self.spelling.match_symptoms(text) if s not in extracted)
+        return extracted
+
+    def answer(self, question):
+        """Best Q&A answer for a lower-cased question, or None."""
+        best_match = None
+        for keyword, words, answer in self.qa_entries:
+            if keyword in question:
+                return answer
+            elif any(word in question for word in words):
+                if len(keyword) > len(best_match or ''):
+                    best_match = answer
+        return best_match
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded_at)),
+            'phrases': len(self.phrases),
+            'keywords': len(self.keyword_symptoms),
+            'qa_entries': len(self.qa_entries),
+            'vocabulary': len(self.spelling.words),
+        }
+
+
+class KnowledgeStore:
+    """Holds the live KnowledgeBase and swaps in reloaded versions."""
+
+    def __init__(self, base_dir, symptom_list, diseases):
+        self.base_dir = base_dir
+        self.symptom_list = list(symptom_list)
+        self.diseases = list(diseases)
+        self._reload_lock = threading.Lock()
+        self._mtimes = self._file_mtimes()
+        self.current = KnowledgeBase.from_files(base_dir, self.symptom_list, self.diseases, version=1)
+        self._watcher = None
+
+    def _file_mtimes(self):
+        return tuple(os.path.getmtime(os.path.join(self.base_dir, f)) for f in (PHRASES_FILE, QA_FILE))
+
+    def reload(self):
+        """Rebuild from disk and swap atomically; the old engine stays on error."""
+        with self._reload_lock:
+            # Remember what we tried so a broken file is not retried until it changes
+            self._mtimes = self._file_mtimes()
+            engine = KnowledgeBase.from_files(
+                self.base_dir, self.symptom_list, self.diseases, version=self.current.version + 1)
+            self.current = engine
+        logging.info('Knowledge reloaded: %s', engine.stats())
+        return engine
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                if self._file_mtimes() != self._mtimes:
+                    self.reload()
+            except Exception as e:
+                logging.error('Knowledge reload failed, keeping version %d: %s', self.current.version, e)
+
+    def start_watcher(self, interval=2.0):
+        """Poll the knowledge files and reload when they change."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name='knowledge-watch', daemon=True)
+            self._watcher.start()
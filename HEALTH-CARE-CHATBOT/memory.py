@@ -0,0 +1,157 @@
+"""Worker memory instrumentation and an RSS budget check.
+
+``MemoryTracker.report()`` returns the process RSS, the heavy libraries
+loaded, and, when ``tracemalloc`` is tracing, the top allocation sites and
+the growth since the last ``mark()``. app.py serves it at
+``/api/admin/memory``; tracing starts at import time when
+``MEDICHAT_TRACEMALLOC=<frames>`` is set (it slows allocation, so it is off
+by default).
+
+``python memory.py --budget-mb 220`` starts a worker in a fresh process,
+measures its RSS once startup is done and exits non-zero when it is over
+budget, so it can gate CI or a deploy. ``--artifact`` checks a lean worker.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import tracemalloc
+
+# Peak RSS from getrusage is Unix-only; psutil (optional) covers the rest
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Libraries whose presence dominates a worker's footprint
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'reportlab', 'pyttsx3')
+
+
+def rss_bytes():
+    """Current resident set size, or None when the platform gives no way to read it.
+
+    Falls back to psutil, then to peak RSS, where /proc is unavailable.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """Peak resident set size, or None when neither getrusage nor psutil has it."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if psutil is not None:
+        # Windows reports the peak working set
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    return None
+
+
+def _mb(n):
+    return None if n is None else round(n / 2**20, 2)
+
+
+class MemoryTracker:
+    """RSS and tracemalloc snapshots for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline = None
+
+    def start(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def mark(self):
+        """Use the current allocations as the baseline for growth reports."""
+        if tracemalloc.is_tracing():
+            with self._lock:
+                self._baseline = self._snapshot()
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ])
+
+    def report(self, top=15, group_by='lineno'):
+        report = {
+            'rss_mb': _mb(rss_bytes()),
+            'peak_rss_mb': _mb(peak_rss_bytes()),
+            'heavy_modules': [m for m in HEAVY_MODULES if m in sys.modules],
+            'tracing': tracemalloc.is_tracing(),
+        }
+        if not tracemalloc.is_tracing():
+            return report
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self._snapshot()
+        report['traced_mb'] = _mb(current)
+        report['traced_peak_mb'] = _mb(peak)
+        # Without an OS figure, traced Python allocations are the best estimate
+        if report['peak_rss_mb'] is None:
+            report['peak_rss_mb'] = report['traced_peak_mb']
+        report['top'] = [
+            {'site': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+            for stat in snapshot.statistics(group_by)[:top]
+        ]
+        with self._lock:
+            baseline = self._baseline
+        if baseline is not None:
+            report['growth_since_mark'] = [
+                {'site': str(stat.traceback), 'size_diff_kb': round(stat.size_diff / 1024, 1),
+                 'count_diff': stat.count_diff}
+                for stat in snapshot.compare_to(baseline, group_by)[:top] if stat.size_diff
+            ]
+        return report
+
+
+_PROBE = '''
+import gc, json, sys
+sys.path.insert(0, {base!r})
+import app
+gc.collect()
+from memory import rss_bytes, HEAVY_MODULES
+print(json.dumps({{"rss": rss_bytes(), "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules]}}))
+'''
+
+
+def measure_worker(artifact=None, env=None):
+    """RSS of a freshly started app.py worker, measured in a child process."""
+    env = dict(os.environ if env is None else env)
+    if artifact:
+        env['MEDICHAT_SERVING_ARTIFACT'] = artifact
+    env.setdefault('MEDICHAT_HISTORY_DB', ':memory:')
+    out = subprocess.run([sys.executable, '-c', _PROBE.format(base=BASE_DIR)], env=env, cwd=BASE_DIR,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check that a worker stays within an RSS budget')
+    parser.add_argument('--budget-mb', type=float, default=float(os.environ.get('MEDICHAT_RSS_BUDGET_MB') or 256))
+    parser.add_argument('--artifact', help='serving artifact for a lean (pandas-free) worker')
+    args = parser.parse_args()
+    result = measure_worker(args.artifact)
+    if result['rss'] is None:
+        parser.error('cannot read RSS on this platform; install psutil')
+    rss_mb = _mb(result['rss'])
+    ok = rss_mb <= args.budget_mb
+    print(json.dumps({'mode': 'lean' if args.artifact else 'full', 'rss_mb': rss_mb,
+                      'budget_mb': args.budget_mb, 'heavy_modules': result['heavy_modules'], 'ok': ok}))
+    sys.exit(0 if ok else 1)
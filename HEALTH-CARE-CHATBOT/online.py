@@ -0,0 +1,263 @@
+"""Incremental learning from confirmed diagnoses.
+
+``OnlineLearner`` keeps the training data in count form: a disease x symptom
+count table, cases per disease, and the distinct (symptom set, disease) rows
+with their weights, i.e. the same compact rows ``training_data.compress_rows``
+produces. It is seeded from the training split at startup. A confirmed case
+from ``/api/diagnose_followup`` adds to a few table cells and one row weight,
+so learning a case costs O(symptoms) and never touches the CSVs.
+
+Confirmations are not learned as they arrive. ``submit()`` checks a case and
+queues it for review; only ``review(case_id, approve=True)`` folds it into
+the tables. The queue is saved to ``review_queue.json``
+(``MEDICHAT_REVIEW_QUEUE``) on every change and reloaded at startup.
+
+The tables back a multinomial Naive Bayes model, which is current after
+every case. The served tree is refit from the compact rows in the
+background every ``MEDICHAT_REFIT_SECONDS`` when new cases have arrived;
+app.py decides whether the refit tree is promoted.
+
+Approved cases are appended to ``learned_cases.jsonl``
+(``MEDICHAT_LEARNED_CASES``) and replayed at startup, so they survive
+restarts without editing Training.csv.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+
+class OnlineLearner:
+    """Symptom x disease count tables, compact rows and a count-based model."""
+
+    def __init__(self, symptoms, diseases, alpha=1.0, log_path=None, review_path=None, max_review=1000):
+        self.symptoms = list(symptoms)
+        self.symptom_index = {symptom: i for i, symptom in enumerate(self.symptoms)}
+        self.diseases = [str(d) for d in diseases]
+        # Class labels can carry stray whitespace; accept them stripped too
+        self.disease_index = {}
+        for i, label in enumerate(self.diseases):
+            self.disease_index.setdefault(label, i)
+            self.disease_index.setdefault(label.strip(), i)
+        self.alpha = alpha
+        self.log_path = log_path
+        self.review_path = review_path
+        self.max_review = max_review
+        self.awaiting_review = {}  # case id -> queued case, oldest first
+
+        n_diseases, n_symptoms = len(self.diseases), len(self.symptoms)
+        self.counts = np.zeros((n_diseases, n_symptoms), dtype=np.float64)
+        self.cases = np.zeros(n_diseases, dtype=np.float64)
+        self.symptom_totals = np.zeros(n_diseases, dtype=np.float64)
+        self.rows = {}  # (symptom indices, disease index) -> weight
+        self.observed = 0
+        self.pending = 0
+        self.refits = 0
+        self.last_refit = None
+        self._lock = threading.Lock()
+        self._refit_lock = threading.Lock()
+        self._refitter = None
+
+    def seed(self, x, y, weights=None):
+        """Add a 0/1 matrix of training rows (symptom columns in order) and labels."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.intp)
+        weights = np.ones(len(y)) if weights is None else np.asarray(weights, dtype=np.float64)
+        with self._lock:
+            np.add.at(self.counts, y, x * weights[:, None])
+            self.cases += np.bincount(y, weights=weights, minlength=len(self.diseases))
+            self.symptom_totals[:] = self.counts.sum(axis=1)
+            for row, label, weight in zip(x, y, weights):
+                key = (tuple(np.flatnonzero(row).tolist()), int(label))
+                self.rows[key] = self.rows.get(key, 0.0) + float(weight)
+
+    def replay(self):
+        """Re-apply the confirmed cases logged by earlier runs."""
+        if not self.log_path or not os.path.exists(self.log_path):
+            return 0
+        replayed = 0
+        with open(self.log_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    case = json.loads(line)
+                    self.observe(case['symptoms'], case['disease'], log=False)
+                    replayed += 1
+                except (ValueError, KeyError, TypeError) as e:
+                    logging.warning('Skipping learned case %r: %s', line.strip(), e)
+        logging.info('Replayed %d learned cases from %s', replayed, self.log_path)
+        return replayed
+
+    def _resolve(self, symptoms, disease):
+        """(label index, sorted symptom indices); ValueError for an unusable case."""
+        label = self.disease_index.get(str(disease).strip())
+        if label is None:
+            raise ValueError(f'Unknown disease {disease!r}')
+        present = sorted({self.symptom_index[s] for s in symptoms if s in self.symptom_index})
+        if not present:
+            raise ValueError('No known symptoms in the confirmed case')
+        return label, present
+
+    def load_review_queue(self):
+        """Restore the cases that were awaiting review when the last run stopped."""
+        if not self.review_path or not os.path.exists(self.review_path):
+            return 0
+        try:
+            with open(self.review_path, encoding='utf-8') as f:
+                cases = json.load(f)
+        except ValueError as e:
+            logging.warning('Ignoring unreadable review queue %s: %s', self.review_path, e)
+            return 0
+        with self._lock:
+            self.awaiting_review = {case['id']: case for case in cases if isinstance(case, dict) and 'id' in case}
+        logging.info('Loaded %d cases awaiting review from %s', len(self.awaiting_review), self.review_path)
+        return len(self.awaiting_review)
+
+    def _save_review_queue(self):
+        # Called with self._lock held
+        if not self.review_path:
+            return
+        tmp = f'{self.review_path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(list(self.awaiting_review.values()), f)
+        os.replace(tmp, self.review_path)
+
+    def submit(self, symptoms, disease, source):
+        """Queue a confirmed case for review; returns the queued case.
+
+        Raises ValueError for an unknown disease or no known symptoms. When
+        the queue is full the oldest case is dropped.
+        """
+        label, present = self._resolve(symptoms, disease)
+        case = {'id': uuid.uuid4().hex[:12], 'disease': self.diseases[label].strip(),
+                'symptoms': [self.symptoms[i] for i in present], 'source': source,
+                'time': round(time.time(), 3)}
+        with self._lock:
+            while len(self.awaiting_review) >= self.max_review:
+                dropped = self.awaiting_review.pop(next(iter(self.awaiting_review)))
+                logging.warning('Review queue full, dropped case %s', dropped['id'])
+            self.awaiting_review[case['id']] = case
+            self._save_review_queue()
+        return case
+
+    def pending_review(self):
+        with self._lock:
+            return list(self.awaiting_review.values())
+
+    def review(self, case_id, approve):
+        """Approve (learn) or reject a queued case; returns the case.
+
+        Raises KeyError for an id that is not awaiting review.
+        """
+        with self._lock:
+            case = self.awaiting_review.pop(case_id)
+            self._save_review_queue()
+        if approve:
+            self.observe(case['symptoms'], case['disease'])
+        return case
+
+    def observe(self, symptoms, disease, log=True):
+        """Fold one confirmed case into the tables; returns the symptoms used.
+
+        Raises ValueError for an unknown disease or no known symptoms.
+        """
+        label, present = self._resolve(symptoms, disease)
+        with self._lock:
+            self.counts[label, present] += 1.0
+            self.cases[label] += 1.0
+            self.symptom_totals[label] += len(present)
+            key = (tuple(present), label)
+            self.rows[key] = self.rows.get(key, 0.0) + 1.0
+            self.observed += 1
+            self.pending += 1
+            if log and self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'disease': self.diseases[label].strip(),
+                                        'symptoms': [self.symptoms[i] for i in present],
+                                        'time': round(time.time(), 3)}) + '\n')
+        return [self.symptoms[i] for i in present]
+
+    def predict(self, symptoms, top=3):
+        """Naive Bayes posterior over diseases: ``[{'disease', 'probability'}, ...]``."""
+        present = [self.symptom_index[s] for s in symptoms if s in self.symptom_index]
+        if not present:
+            return []
+        alpha = self.alpha
+        with self._lock:
+            counts = self.counts[:, present]
+            cases = self.cases.copy()
+            totals = self.symptom_totals.copy()
+        # log P(d) + sum over present symptoms of log P(s | d)
+        scores = (np.log(cases + alpha)
+                  + np.log(counts + alpha).sum(axis=1)
+                  - len(present) * np.log(totals + alpha * len(self.symptoms)))
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        order = np.argsort(-probabilities, kind='stable')[:top]
+        return [{'disease': self.diseases[i].strip(), 'probability': round(float(probabilities[i]), 4)}
+                for i in order]
+
+    def training_rows(self, columns):
+        """Compact rows over ``columns``: (0/1 matrix, label indices, weights, cases included)."""
+        position = {self.symptom_index[c]: j for j, c in enumerate(columns) if c in self.symptom_index}
+        with self._lock:
+            rows = list(self.rows.items())
+            pending = self.pending
+        x = np.zeros((len(rows), len(columns)), dtype=np.float64)
+        y = np.empty(len(rows), dtype=np.intp)
+        w = np.empty(len(rows), dtype=np.float64)
+        for r, ((present, label), weight) in enumerate(rows):
+            x[r, [position[i] for i in present if i in position]] = 1.0
+            y[r] = label
+            w[r] = weight
+        return x, y, w, pending
+
+    def refit(self, fit, columns):
+        """Run ``fit(x, y, w)`` on the rows over ``columns`` if cases arrived since the last refit.
+
+        ``fit`` builds and swaps in the new model; returns its result, or None
+        when there was nothing new.
+        """
+        with self._refit_lock:
+            if not self.pending:
+                return None
+            started = time.perf_counter()
+            x, y, w, included = self.training_rows(columns)
+            result = fit(x, y, w)
+            with self._lock:
+                self.pending -= included
+                self.refits += 1
+                self.last_refit = {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                   'seconds': round(time.perf_counter() - started, 3),
+                                   'new_cases': included}
+            return result
+
+    def start_refitter(self, interval, fit, columns):
+        """Refit in a background thread every ``interval`` seconds."""
+        if self._refitter is None:
+            self._refitter = threading.Thread(target=self._refit_loop, args=(interval, fit, columns),
+                                              name='online-refit', daemon=True)
+            self._refitter.start()
+
+    def _refit_loop(self, interval, fit, columns):
+        while True:
+            time.sleep(interval)
+            try:
+                self.refit(fit, columns)
+            except Exception as e:
+                logging.error('Background refit failed, keeping the served model: %s', e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'observed': self.observed,
+                'awaiting_review': len(self.awaiting_review),
+                'pending': self.pending,
+                'compact_rows': len(self.rows),
+                'training_cases': int(self.cases.sum()),
+                'refits': self.refits,
+                'last_refit': self.last_refit,
+            }
@@ -0,0 +1,312 @@
+"""Fast PDF reports drawn directly on a ReportLab canvas.
+
+``reports.render_pdf`` builds a Platypus story for every report: each
+paragraph is parsed as markup, styled, measured and split by the frame
+machinery. The report layout never changes, so ``ReportLayout`` works it
+out once instead: page geometry, fonts, the metadata table columns and the
+centred title are fixed when the layout is built, and word widths are
+cached per font. A report then only needs its own text wrapped and drawn,
+with a page break wherever the next line would cross the bottom margin.
+
+The content matches ``reports.render_pdf``. Text is drawn as written rather
+than parsed as Platypus markup, so ``<`` and ``&`` in patient input are
+printed instead of breaking the render.
+
+``python pdf_layout.py --count 200`` compares throughput with the
+Platypus renderer.
+"""
+import argparse
+import collections
+import functools
+import io
+import json
+import logging
+import re
+import time
+
+from reports import CHATBOT_NAME, format_confidence
+
+# PDF generation (optional)
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+    HAVE_REPORTLAB = True
+except Exception:
+    HAVE_REPORTLAB = False
+
+# Font, size, leading, space before, space after; the same values as the
+# paragraph styles in reports._styles()
+TextStyle = collections.namedtuple('TextStyle', 'font size leading space_before space_after')
+TITLE = TextStyle('Helvetica-Bold', 18, 22, 0, 12)
+HEADING = TextStyle('Helvetica-Bold', 12, 14, 12, 6)
+BODY = TextStyle('Helvetica', 10, 13, 0, 0)
+TABLE = TextStyle('Helvetica', 10, 12, 0, 0)
+
+# reportlab.rl_config.spaceShrinkage
+SPACE_SHRINKAGE = 0.05
+
+
+class FontMetrics:
+    """Word widths for one font, measured once at size 1000."""
+
+    def __init__(self, font, max_words=20000):
+        self.font = font
+        self.max_words = max_words
+        self._words = {}
+        self.space = stringWidth(' ', font, 1000)
+
+    def width(self, word, size):
+        w = self._words.get(word)
+        if w is None:
+            if len(self._words) >= self.max_words:
+                self._words.clear()
+            w = self._words[word] = stringWidth(word, self.font, 1000)
+        return w * size / 1000
+
+    def wrap(self, text, size, max_width):
+        """Greedy word wrap to ``max_width`` points; over-long words are split.
+
+        Like Platypus, a line may overrun by 5% of a space per word gap, so
+        both renderers break lines in the same places.
+        """
+        space = self.space * size / 1000
+        shrink = SPACE_SHRINKAGE * space
+        lines, line, line_width = [], [], 0.0
+        for word in str(text).split():
+            w = self.width(word, size)
+            if w > max_width:
+                # Break a word that cannot fit on any line
+                if line:
+                    lines.append(' '.join(line))
+                    line, line_width = [], 0.0
+                piece = ''
+                for ch in word:
+                    if piece and self.width(piece + ch, size) > max_width:
+                        lines.append(piece)
+                        piece = ''
+                    piece += ch
+                word, w = piece, self.width(piece, size)
+            if line and line_width + space + w > max_width + shrink * len(line):
+                lines.append(' '.join(line))
+                line, line_width = [word], w
+            else:
+                line_width += (space if line else 0.0) + w
+                line.append(word)
+        if line:
+            lines.append(' '.join(line))
+        return lines
+
+
+class _Page:
+    """Drawing cursor over one report; starts a new page when text runs out of room.
+
+    All text on a page goes into one PDF text object, so each line costs a
+    move and a show operator rather than a whole text block.
+    """
+
+    def __init__(self, layout, pdf):
+        self.layout = layout
+        self.pdf = pdf
+        self.y = layout.top
+        self.pages = 1
+        self._gap = 0.0
+        self._at_top = True
+        self._text = pdf.beginText()
+        self._font = None
+
+    def text(self, x, y, line, style):
+        if self._font != (style.font, style.size):
+            self._font = (style.font, style.size)
+            self._text.setFont(style.font, style.size)
+        self._text.setTextOrigin(x, y)
+        self._text.textOut(line)
+
+    def finish(self):
+        """Flush this page's text and close it."""
+        self.pdf.drawText(self._text)
+        self.pdf.showPage()
+
+    def space(self, points):
+        # Adjacent spacing collapses to the larger value, as in Platypus frames
+        self._gap = max(self._gap, points)
+
+    def _advance(self, height):
+        gap = 0.0 if self._at_top else self._gap
+        if self.y - gap - height < self.layout.bottom and not self._at_top:
+            self.finish()
+            self._text = self.pdf.beginText()
+            self._font = None
+            self.pages += 1
+            self.y, gap = self.layout.top, 0.0
+        self.y -= gap
+        self._gap = 0.0
+        self._at_top = False
+
+    def lines(self, lines, style, x=None):
+        """Draw wrapped lines, breaking across pages between lines."""
+        x = self.layout.left if x is None else x
+        self.space(style.space_before)
+        for line in lines:
+            self._advance(style.leading)
+            self.y -= style.leading
+            # Baseline sits a fifth of the leading above the line's bottom
+            self.text(x, self.y + style.leading * 0.2, line, style)
+        self.space(style.space_after)
+
+    def block(self, height, draw):
+        """Draw something of fixed ``height`` that must stay on one page."""
+        self._advance(height)
+        draw(self.y)
+        self.y -= height
+
+
+class ReportLayout:
+    """A precomputed page template for health reports."""
+
+    def __init__(self, pagesize=None, margin=None):
+        self.pagesize = pagesize or letter
+        margin = inch if margin is None else margin
+        self.page_width, self.page_height = self.pagesize
+        # Platypus frames keep 6pt of padding inside the page margins
+        inset = margin + 6
+        self.left = inset
+        self.top = self.page_height - inset
+        self.bottom = inset
+        self.frame_width = self.page_width - 2 * inset
+        self.metrics = {font: FontMetrics(font) for font in ('Helvetica', 'Helvetica-Bold')}
+
+        self.title = f'{CHATBOT_NAME} - Health Report'
+        self.title_x = self.left + (self.frame_width - self._width(self.title, TITLE)) / 2
+
+        # Metadata table: two fixed columns, centred in the frame like a
+        # Platypus Table, with 6pt side and bottom and 3pt top padding
+        self.col_widths = (110, 350)
+        self.table_x = self.left + (self.frame_width - sum(self.col_widths)) / 2
+        self.cell_padding = (6, 3, 6)
+        self.value_x = self.table_x + self.col_widths[0] + self.cell_padding[0]
+        self.value_width = self.col_widths[1] - 2 * self.cell_padding[0]
+
+    def _width(self, text, style):
+        return self.metrics[style.font].width(text, style.size)
+
+    def wrap(self, text, style, width=None):
+        return self.metrics[style.font].wrap(text, style.size, self.frame_width if width is None else width)
+
+    def _table(self, page, rows):
+        padding_side, padding_top, padding_bottom = self.cell_padding
+        for label, value in rows:
+            values = self.wrap(value, TABLE, self.value_width) or ['']
+            height = padding_top + len(values) * TABLE.leading + padding_bottom
+
+            def draw(top, label=label, values=values):
+                # First baseline one font size below the cell's top padding
+                y = top - padding_top - TABLE.size
+                page.text(self.table_x + padding_side, y, label, TABLE)
+                for line in values:
+                    page.text(self.value_x, y, line, TABLE)
+                    y -= TABLE.leading
+
+            page.block(height, draw)
+
+    def _bullets(self, page, items):
+        for item in items:
+            page.lines(self.wrap(f'• {item}', BODY), BODY)
+
+    def render(self, report):
+        """PDF bytes for one report dict (see ``app.resolve_report``)."""
+        diagnosis = report['diagnosis']
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=self.pagesize)
+        page = _Page(self, pdf)
+
+        if report.get('logo_path'):
+            try:
+                x = self.left + (self.frame_width - 60) / 2
+                page.block(60, lambda top: pdf.drawImage(report['logo_path'], x, top - 60, width=60, height=60))
+            except Exception:
+                pass
+        page.lines([self.title], TITLE, x=self.title_x)
+        self._table(page, [
+            ('Date:', report['date']),
+            ('Patient:', report['patient_name'] or 'N/A'),
+            ('Age:', str(report['age']) or 'N/A'),
+            ('Primary Disease:', diagnosis.get('disease', 'N/A')),
+            ('Confidence:', format_confidence(diagnosis.get('confidence', 0))),
+        ])
+        page.space(8)
+
+        if report['input_text']:
+            page.lines(['Input:'], HEADING)
+            page.lines(self.wrap(report['input_text'], BODY), BODY)
+            page.space(6)
+
+        page.lines(['Description'], HEADING)
+        page.lines(self.wrap(diagnosis.get('description', 'No description available'), BODY), BODY)
+        page.space(8)
+
+        page.lines(['Precautions'], HEADING)
+        self._bullets(page, diagnosis.get('precautions', []) or ['Follow up with a healthcare professional'])
+        page.space(8)
+
+        page.lines(['Common Treatments'], HEADING)
+        self._bullets(page, report['treatments'] or ['None specified'])
+        page.space(8)
+
+        page.lines(['All Possible Diseases'], HEADING)
+        page.lines(self.wrap(', '.join(diagnosis.get('all_possible_diseases', [])), BODY), BODY)
+
+        page.finish()
+        pdf.save()
+        return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=1)
+def _layout():
+    return ReportLayout()
+
+
+def warm():
+    """Build this process's shared layout before its first report."""
+    if HAVE_REPORTLAB:
+        _layout()
+
+
+def render_layout_pdf(report):
+    """PDF bytes for one report dict, using the shared layout of this process."""
+    return _layout().render(report)
+
+
+def page_count(pdf_bytes):
+    return len(re.findall(rb'/Type /Page\b(?!s)', pdf_bytes))
+
+
+def benchmark(count):
+    import reports
+    samples = [reports._sample_report(i) for i in range(count)]
+    long_report = dict(samples[0], input_text='I have had a persistent cough and fever. ' * 400)
+    # Build both renderers' cached state before timing
+    reports.render_pdf(samples[0])
+    render_layout_pdf(samples[0])
+    results = {}
+    for mode, render in (('platypus', reports.render_pdf), ('layout', render_layout_pdf)):
+        start = time.perf_counter()
+        size = sum(len(render(report)) for report in samples)
+        elapsed = time.perf_counter() - start
+        results[mode] = count / elapsed
+        print(json.dumps({'mode': mode, 'reports': count, 'seconds': round(elapsed, 3),
+                          'reports_per_sec': round(count / elapsed, 1), 'avg_bytes': size // count}))
+    print(json.dumps({'speedup': round(results['layout'] / results['platypus'], 2),
+                      'long_report_pages': {'platypus': page_count(reports.render_pdf(long_report)),
+                                            'layout': page_count(render_layout_pdf(long_report))}}))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Benchmark the layout renderer against Platypus')
+    parser.add_argument('--count', type=int, default=200)
+    args = parser.parse_args()
+    if not HAVE_REPORTLAB:
+        parser.error('reportlab not installed; install with `pip install reportlab`')
+    benchmark(args.count)
@@ -0,0 +1,216 @@
+"""On-demand per-request profiling for slow handlers.
+
+``RequestProfiler.wrap(handler)`` returns the handler itself when profiling
+is disabled, so there is no per-request cost at all. When enabled, a request
+is profiled if it carries the ``X-Profile: 1`` header (and the caller passes
+the admin check) or if it is the N-th request under 1-in-N sampling.
+
+Two capture modes:
+
+* ``sample``   a background thread snapshots the handler thread's stack every
+               ``interval`` seconds and writes collapsed stacks
+               (``a;b;c 12`` lines, ready for flamegraph.pl / speedscope)
+* ``cprofile`` deterministic cProfile; writes a ``.prof`` file for pstats,
+               snakeviz and similar tools. Only one cProfile can be active
+               per process (CPython 3.12+), so captures are serialized; a
+               request arriving during a capture runs unprofiled
+
+Output files rotate in ``directory`` (oldest deleted beyond ``keep``). A
+summary of the top functions by cumulative time is kept in memory for the
+admin endpoint.
+"""
+import collections
+import cProfile
+import functools
+import glob
+import itertools
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class _StackSampler:
+    """Collect collapsed stacks of one thread, rooted at ``root_code``."""
+
+    def __init__(self, thread_id, interval, root_code):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_code = root_code
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                if frame.f_code is self.root_code:
+                    break
+                frame = frame.f_back
+            else:
+                continue
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class RequestProfiler:
+    """Profile selected requests of wrapped handlers."""
+
+    def __init__(self, directory, sample_every=0, allow_header=False, mode='sample',
+                 interval=0.001, keep=200, top=20, is_authorized=None, get_header=None):
+        self.directory = directory
+        self.sample_every = sample_every
+        self.allow_header = allow_header
+        self.mode = mode
+        self.interval = interval
+        self.keep = keep
+        self.top = top
+        self.is_authorized = is_authorized or (lambda: False)
+        self.get_header = get_header or (lambda name: None)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        self.skipped = 0
+        self.recent = collections.deque(maxlen=50)
+        self.cumulative = collections.Counter()
+        self._files = collections.deque()
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._files.extend(sorted(glob.glob(os.path.join(directory, '*')), key=os.path.getmtime))
+
+    @property
+    def enabled(self):
+        return bool(self.sample_every) or self.allow_header
+
+    def wrap(self, handler):
+        """Return ``handler`` unchanged when disabled, else a profiling wrapper."""
+        if not self.enabled:
+            return handler
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            if not self._should_profile():
+                return handler(*args, **kwargs)
+            return self._profile(handler.__name__, handler, args, kwargs)
+        return wrapper
+
+    def _should_profile(self):
+        if self.allow_header and self.get_header('X-Profile') == '1' and self.is_authorized():
+            return True
+        return bool(self.sample_every) and next(self._counter) % self.sample_every == 0
+
+    def _profile(self, name, handler, args, kwargs):
+        stamp = time.strftime('%Y%m%d_%H%M%S') + f'_{time.time_ns() % 1_000_000:06d}'
+        start = time.perf_counter()
+        if self.mode == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                return self._unprofiled(handler, args, kwargs)
+            try:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiler or debugger owns the profiling hook
+                    return self._unprofiled(handler, args, kwargs)
+                try:
+                    return handler(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    elapsed = time.perf_counter() - start
+                    path = os.path.join(self.directory, f'{name}_{stamp}.prof')
+                    self._save_cprofile(name, profile, path, elapsed)
+            finally:
+                self._cprofile_lock.release()
+        else:
+            sampler = _StackSampler(threading.get_ident(), self.interval, handler.__code__)
+            sampler.start()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                sampler.stop()
+                elapsed = time.perf_counter() - start
+                path = os.path.join(self.directory, f'{name}_{stamp}.folded')
+                self._save_samples(name, sampler.stacks, path, elapsed)
+
+    def _unprofiled(self, handler, args, kwargs):
+        with self._lock:
+            self.skipped += 1
+        return handler(*args, **kwargs)
+
+    def _save_cprofile(self, name, profile, path, elapsed):
+        try:
+            profile.dump_stats(path)
+            stats = pstats.Stats(profile).stats
+            functions = {f'{func} ({os.path.basename(file)}:{line})': ct
+                         for (file, line, func), (cc, nc, tt, ct, callers) in stats.items()}
+            self._finish(name, path, elapsed, functions)
+        except Exception as e:
+            logging.error('Failed to save profile %s: %s', path, e)
+
+    def _save_samples(self, name, stacks, path, elapsed):
+        try:
+            if not stacks:
+                # Finished within one sampling interval; nothing to write
+                self._finish(name, None, elapsed, {})
+                return
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            total = sum(stacks.values()) or 1
+            per_sample = elapsed / total
+            functions = collections.Counter()
+            for stack, count in stacks.items():
+                for label in set(stack.split(';')):
+                    functions[label] += count * per_sample
+            self._finish(name, path, elapsed, functions)
+        except Exception as e:
+            logging.error('Failed to save profile %s: %s', path, e)
+
+    def _finish(self, name, path, elapsed, functions):
+        top = sorted(functions.items(), key=lambda kv: kv[1], reverse=True)[:self.top]
+        with self._lock:
+            if path:
+                self._files.append(path)
+            while len(self._files) > self.keep:
+                old = self._files.popleft()
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+            self.cumulative.update(dict(functions))
+            self.recent.append({
+                'handler': name,
+                'file': os.path.basename(path) if path else None,
+                'elapsed_ms': round(elapsed * 1000, 2),
+                'top': [{'function': f, 'cumulative_ms': round(t * 1000, 3)} for f, t in top],
+            })
+        logging.info('Profiled %s in %.1f ms -> %s', name, elapsed * 1000, path or 'no samples')
+
+    def summary(self):
+        with self._lock:
+            top = self.cumulative.most_common(self.top)
+            return {
+                'mode': self.mode,
+                'sample_every': self.sample_every,
+                'header_enabled': self.allow_header,
+                'directory': self.directory,
+                'skipped_busy': self.skipped,
+                'top_cumulative': [{'function': f, 'cumulative_ms': round(t * 1000, 3)} for f, t in top],
+                'recent': list(self.recent),
+            }
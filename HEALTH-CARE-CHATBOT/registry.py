@@ -0,0 +1,299 @@
+"""Registry of loaded model versions with traffic split and shadow scoring.
+
+Several fitted trees can be served side by side. ``choose()`` picks the
+version for a request by configured traffic share. When a shadow version is
+set, ``shadow()`` re-scores the same input on it from a background thread,
+after the response has been computed, and counts how often it agrees with
+the version that answered. Serving and shadow latencies are tracked per
+version, so a faster or retrained model can be promoted on evidence.
+
+Versions are immutable once registered. Every change publishes one tuple,
+(route names, cumulative shares, versions, shadow), and the request path
+reads that tuple once, so a route never points at a version retired by the
+same update and no lock is taken per request, with or without the GIL.
+"""
+import collections
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+import numpy as np
+
+from serving import TREE_UNDEFINED
+
+# ``set_routing(shadow=UNCHANGED)`` keeps the current shadow; None clears it
+UNCHANGED = object()
+
+
+def normalize_symptom(symptom):
+    """Case- and underscore-insensitive form used to match tree features."""
+    return str(symptom).replace('_', ' ').strip().lower()
+
+
+class ModelVersion:
+    """One ``serving.FlatTree`` and the symptom columns it was trained on.
+
+    Diagnosis walks the tree once per symptom with only that symptom set,
+    so each walk depends on the symptom alone. All of them are walked here,
+    once, into a read-only table; serving a symptom is one dict lookup.
+    """
+
+    def __init__(self, name, model, columns, accuracy=None, description=''):
+        self.name = name
+        self.model = model
+        self.columns = list(columns)
+        self.index = {symptom: i for i, symptom in enumerate(self.columns)}
+        # Feature name per tree node, resolved once instead of per request
+        self.feature_names = [
+            self.columns[i] if i != TREE_UNDEFINED else 'undefined!'
+            for i in model.feature
+        ]
+        normalized = [normalize_symptom(name) for name in self.feature_names]
+        self.paths = MappingProxyType({
+            symptom: self._walk(symptom, normalized)
+            for symptom in {normalize_symptom(c) for c in self.columns}
+        })
+        # Where a symptom the tree does not split on ends up
+        self._unmatched_path = self._walk(None, normalized)
+        self.accuracy = accuracy
+        self.description = description
+        self.created = time.time()
+
+    def _walk(self, symptom, normalized):
+        """(leaf node, features split on the way) with only ``symptom`` present"""
+        tree = self.model
+        node, present = 0, []
+        while tree.feature[node] != TREE_UNDEFINED:
+            value = 1 if normalized[node] == symptom else 0
+            if value <= tree.threshold[node]:
+                node = tree.children_left[node]
+            else:
+                present.append(self.feature_names[node])
+                node = tree.children_right[node]
+        return int(node), tuple(present)
+
+    def path(self, symptom):
+        """Leaf and present features for a single symptom."""
+        return self.paths.get(normalize_symptom(symptom), self._unmatched_path)
+
+    def vector(self, symptoms):
+        """0/1 input row over this version's columns"""
+        row = np.zeros(len(self.columns))
+        for symptom in symptoms:
+            i = self.index.get(symptom)
+            if i is not None:
+                row[i] = 1
+        return row
+
+    def info(self):
+        return {
+            'name': self.name,
+            'description': self.description,
+            'symptoms': len(self.columns),
+            'depth': self.model.get_depth(),
+            'nodes': self.model.node_count,
+            'accuracy': self.accuracy,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.created)),
+        }
+
+
+class LatencyStats:
+    """Count, mean and percentiles over the most recent ``window`` samples."""
+
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.recent = collections.deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        p50, p95, p99 = np.percentile(list(self.recent), [50, 95, 99]) * 1000
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3),
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+        }
+
+
+class ModelRegistry:
+    """Loaded versions, the traffic split between them and the shadow."""
+
+    def __init__(self, max_shadow_pending=1000):
+        self._lock = threading.Lock()
+        self.versions = {}
+        self.primary = None
+        self.weights = {}
+        self.shadow_name = None
+        self._routes = ((), ())
+        self._snapshot = ((), (), {}, None)  # (names, cumulative, versions, shadow)
+        self._served = collections.defaultdict(LatencyStats)
+        self._shadowed = collections.defaultdict(LatencyStats)
+        self._agreement = collections.defaultdict(collections.Counter)
+        self.max_shadow_pending = max_shadow_pending
+        self._shadow_pending = 0
+        self.shadow_dropped = 0
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+
+    def register(self, version, primary=False):
+        """Add a version; the first one (or ``primary=True``) takes all traffic."""
+        with self._lock:
+            if version.name in self.versions:
+                raise ValueError(f'Model version {version.name!r} already exists')
+            self.versions = {**self.versions, version.name: version}
+            if primary or self.primary is None:
+                self.primary = version.name
+                self._set_weights({version.name: 1.0})
+            self._publish()
+        logging.info('Registered model version %s: %s', version.name, version.info())
+        return version
+
+    def promote(self, version, retire=None):
+        """Register ``version`` and hand it the primary's traffic share in one step.
+
+        Other versions keep their share. ``retire`` names a version to unload
+        afterwards, unless it still serves traffic or is the shadow.
+        """
+        with self._lock:
+            if version.name in self.versions:
+                raise ValueError(f'Model version {version.name!r} already exists')
+            self.versions = {**self.versions, version.name: version}
+            if self.primary in self.weights:
+                self._set_weights({version.name if name == self.primary else name: w
+                                   for name, w in self.weights.items()})
+            self.primary = version.name
+            self._retire(retire)
+            self._publish()
+        logging.info('Promoted model version %s: %s', version.name, version.info())
+        return version
+
+    def retire(self, name):
+        """Unload ``name`` unless it is the primary, serves traffic or is the shadow."""
+        with self._lock:
+            retired = self._retire(name)
+            self._publish()
+            return retired
+
+    def _retire(self, name):
+        if name not in self.versions or name == self.primary or name in self.weights or name == self.shadow_name:
+            return False
+        self.versions = {n: v for n, v in self.versions.items() if n != name}
+        return True
+
+    def get(self, name):
+        return self.versions.get(name)
+
+    def set_routing(self, weights=None, shadow=UNCHANGED):
+        """Replace the traffic split and/or the shadow version (None clears it).
+
+        Both are validated before either is applied, so a bad request
+        changes nothing.
+        """
+        with self._lock:
+            table = self._route_table(weights) if weights is not None else None
+            if shadow is not UNCHANGED and shadow is not None and shadow not in self.versions:
+                raise ValueError(f'Unknown model version {shadow!r}')
+            if table is not None:
+                self.weights, self._routes = table
+            if shadow is not UNCHANGED:
+                self.shadow_name = shadow
+            self._publish()
+
+    def _publish(self):
+        # Called with self._lock held; readers see the whole tuple or the old one
+        self._snapshot = (*self._routes, self.versions, self.shadow_name)
+
+    def _set_weights(self, weights):
+        self.weights, self._routes = self._route_table(weights)
+
+    def _route_table(self, weights):
+        """Normalized shares and (names, cumulative) routes; ValueError if invalid."""
+        if not isinstance(weights, dict):
+            raise TypeError('weights must map version names to traffic shares')
+        unknown = [name for name in weights if name not in self.versions]
+        if unknown:
+            raise ValueError(f'Unknown model versions: {", ".join(unknown)}')
+        weights = {name: float(w) for name, w in weights.items() if float(w) > 0}
+        if not weights:
+            raise ValueError('At least one version needs a positive traffic share')
+        total = sum(weights.values())
+        names = tuple(weights)
+        cumulative = tuple(np.cumsum([weights[n] / total for n in names]))
+        return {name: weights[name] / total for name in names}, (names, cumulative)
+
+    def choose(self):
+        """Version to serve this request, drawn by traffic share."""
+        names, cumulative, versions, _ = self._snapshot
+        if len(names) == 1:
+            return versions[names[0]]
+        draw = random.random()
+        for name, edge in zip(names, cumulative):
+            if draw < edge:
+                return versions[name]
+        return versions[names[-1]]
+
+    def record(self, version, seconds):
+        with self._lock:
+            self._served[version.name].add(seconds)
+
+    def shadow(self, score, served_result, served_version):
+        """Score ``score(shadow_version)`` off the request path and compare.
+
+        Skipped when no shadow is set or it served this request, and dropped
+        (counted) when the shadow backlog is full.
+        """
+        _, _, versions, shadow_name = self._snapshot
+        version = versions.get(shadow_name)
+        if version is None or version.name == served_version.name:
+            return
+        with self._lock:
+            if self._shadow_pending >= self.max_shadow_pending:
+                self.shadow_dropped += 1
+                return
+            self._shadow_pending += 1
+        self._shadow_executor.submit(self._run_shadow, version, score, served_result, served_version.name)
+
+    def _run_shadow(self, version, score, served_result, served_name):
+        try:
+            start = time.perf_counter()
+            result = score(version)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._shadowed[version.name].add(elapsed)
+                self._agreement[(version.name, served_name)]['agree' if result == served_result else 'disagree'] += 1
+        except Exception as e:
+            logging.error('Shadow scoring on %s failed: %s', version.name, e)
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+
+    def stats(self):
+        with self._lock:
+            agreement = []
+            for (shadow, served), counts in self._agreement.items():
+                total = counts['agree'] + counts['disagree']
+                agreement.append({'shadow': shadow, 'served': served, 'compared': total,
+                                  'agreement': round(counts['agree'] / total, 4) if total else None})
+            return {
+                'primary': self.primary,
+                'weights': dict(self.weights),
+                'shadow': self.shadow_name,
+                'shadow_pending': self._shadow_pending,
+                'shadow_dropped': self.shadow_dropped,
+                'versions': [
+                    {**v.info(), 'traffic': self.weights.get(name, 0.0),
+                     'served': self._served[name].summary(), 'shadow': self._shadowed[name].summary()}
+                    for name, v in self.versions.items()
+                ],
+                'agreement': agreement,
+            }
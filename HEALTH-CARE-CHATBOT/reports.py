@@ -0,0 +1,295 @@
+"""PDF health reports, single and in bulk.
+
+``render_pdf(report)`` turns a plain report dict (see ``app.resolve_report``)
+into PDF bytes with ReportLab Platypus. It only depends on its argument, so
+it can run in worker processes; paragraph styles are built once per process.
+
+``render_all`` fans reports out over an executor, keeping at most
+``max_in_flight`` renders outstanding and yielding them as they complete;
+without an executor it renders them one by one on the calling thread.
+Closing it early (a client disconnecting mid-download) cancels the renders
+that have not started.
+``stream_zip`` writes those results into a ZIP archive chunk by chunk, so a
+bulk export of any size is held in memory a few reports at a time.
+
+``python reports.py --count 200`` benchmarks throughput in reports/sec.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import functools
+import importlib.machinery
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import zipfile
+
+# PDF generation (optional)
+try:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+    from reportlab.platypus.tables import Table, TableStyle
+    HAVE_REPORTLAB = True
+except Exception:
+    HAVE_REPORTLAB = False
+
+CHATBOT_NAME = 'MediChat'
+
+
+@functools.lru_cache(maxsize=1)
+def _styles():
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle('TitleStyle', parent=styles['Title'], fontSize=18, leading=22, spaceAfter=12),
+        'heading': ParagraphStyle('Heading', parent=styles['Heading2'], fontSize=12, leading=14, spaceAfter=6),
+        'normal': ParagraphStyle('Normal', parent=styles['Normal'], fontSize=10, leading=13),
+        'table': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]),
+    }
+
+
+def format_confidence(confidence):
+    if isinstance(confidence, (int, float)):
+        return f'{round(confidence * 100, 2)}%'
+    return str(confidence)
+
+
+def report_filename(report, timestamp):
+    safe_name = re.sub(r'[^0-9A-Za-z_-]', '', (report['patient_name'] or 'patient').replace(' ', '_'))
+    return f"{CHATBOT_NAME}_{safe_name}_{timestamp}.pdf"
+
+
+def render_pdf(report):
+    """PDF bytes for one report dict."""
+    styles = _styles()
+    title_style, heading_style, normal_style = styles['title'], styles['heading'], styles['normal']
+    diagnosis = report['diagnosis']
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=inch, leftMargin=inch, topMargin=inch, bottomMargin=inch)
+    elements = []
+
+    if report.get('logo_path'):
+        try:
+            elements.append(Image(report['logo_path'], width=60, height=60))
+        except Exception:
+            pass
+    elements.append(Paragraph(f"{CHATBOT_NAME} - Health Report", title_style))
+    metadata = [
+        ['Date:', report['date']],
+        ['Patient:', report['patient_name'] or 'N/A'],
+        ['Age:', str(report['age']) or 'N/A'],
+        ['Primary Disease:', diagnosis.get('disease', 'N/A')],
+        ['Confidence:', format_confidence(diagnosis.get('confidence', 0))],
+    ]
+    table = Table(metadata, colWidths=[110, 350])
+    table.setStyle(styles['table'])
+    elements.append(table)
+    elements.append(Spacer(1, 8))
+
+    if report['input_text']:
+        elements.append(Paragraph('<b>Input:</b>', heading_style))
+        elements.append(Paragraph(report['input_text'], normal_style))
+        elements.append(Spacer(1, 6))
+
+    elements.append(Paragraph('<b>Description</b>', heading_style))
+    elements.append(Paragraph(diagnosis.get('description', 'No description available'), normal_style))
+    elements.append(Spacer(1, 8))
+
+    elements.append(Paragraph('<b>Precautions</b>', heading_style))
+    precautions = diagnosis.get('precautions', []) or []
+    for p in precautions or ['Follow up with a healthcare professional']:
+        elements.append(Paragraph(f'• {p}', normal_style))
+    elements.append(Spacer(1, 8))
+
+    elements.append(Paragraph('<b>Common Treatments</b>', heading_style))
+    for t in report['treatments'] or ['None specified']:
+        elements.append(Paragraph(f'• {t}', normal_style))
+    elements.append(Spacer(1, 8))
+
+    elements.append(Paragraph('<b>All Possible Diseases</b>', heading_style))
+    elements.append(Paragraph(', '.join(diagnosis.get('all_possible_diseases', [])), normal_style))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def _render_named(job, render=render_pdf):
+    """(name, pdf bytes or None, error or None); runs in a worker."""
+    name, report = job
+    try:
+        return name, render(report), None
+    except Exception as e:
+        return name, None, str(e)
+
+
+def render_all(jobs, executor, max_in_flight, render=render_pdf):
+    """Render ``(name, report)`` jobs on ``executor``, yielding in completion order.
+
+    ``render`` must be a module-level function so it can reach process workers.
+    """
+    if executor is None:
+        for job in jobs:
+            yield _render_named(job, render)
+        return
+    jobs = iter(jobs)
+    pending = {executor.submit(_render_named, job, render) for job in itertools.islice(jobs, max_in_flight)}
+    try:
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                job = next(jobs, None)
+                if job is not None:
+                    pending.add(executor.submit(_render_named, job, render))
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _ChunkSink:
+    """Write-only file object collecting what ZipFile writes between yields."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(results, errors=()):
+    """ZIP archive bytes, chunk by chunk, from ``(name, pdf, error)`` results.
+
+    Failed renders and ``errors`` (``(name, message)`` pairs) are listed in
+    ``errors.txt`` at the end of the archive.
+    """
+    sink = _ChunkSink()
+    failures = list(errors)
+    # PDFs are already compressed; storing them avoids burning CPU for nothing
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, pdf, error in results:
+            if pdf is None:
+                failures.append((name, error))
+                continue
+            archive.writestr(name, pdf)
+            yield sink.drain()
+        if failures:
+            archive.writestr('errors.txt', ''.join(f'{name}: {message}\n' for name, message in failures))
+    yield sink.drain()
+
+
+def _init_worker():
+    """Build a worker's renderer state once, before its first report."""
+    import pdf_layout
+    if HAVE_REPORTLAB:
+        _styles()
+    pdf_layout.warm()
+
+
+_spawn_lock = threading.Lock()
+
+
+def process_pool(workers):
+    """Report worker processes, started with spawn on every platform.
+
+    Forking the server would copy locks held by its background threads
+    (history writer, TTS, refits) into the children. A spawned child re-runs
+    the parent's main script unless that has a module spec, and ``python
+    app.py`` would then train the model again in every worker. So all
+    workers are started here, with the main script given a placeholder spec
+    only while they launch; the pool starts no others later. Jobs must not
+    reference functions defined in ``__main__``. Raises if workers cannot
+    start on this platform.
+    """
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker)
+    main = sys.modules.get('__main__')
+    hide = main is not None and getattr(main, '__spec__', None) is None and getattr(main, '__file__', None)
+    with _spawn_lock:
+        if hide:
+            main.__spec__ = importlib.machinery.ModuleSpec('__main__', None)
+        try:
+            # Each submit finds no idle worker and launches one, synchronously
+            started = [pool.submit(int) for _ in range(workers)]
+        finally:
+            if hide:
+                main.__spec__ = None
+    try:
+        for future in started:
+            future.result(timeout=60)
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    return pool
+
+
+def _sample_report(i):
+    return {
+        'patient_name': f'Patient {i}',
+        'age': 30 + i % 50,
+        'input_text': 'I have fever, cough and a headache for three days',
+        'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'logo_path': None,
+        'treatments': ['Rest and stay well hydrated.', 'Seek medical consultation for specific prescription medicines.'],
+        'diagnosis': {
+            'disease': 'Common Cold', 'confidence': 0.87,
+            'description': 'The common cold is a viral infection of your nose and throat. ' * 4,
+            'precautions': ['drink vitamin c rich drinks', 'take vapour', 'avoid cold food', 'keep fever in check'],
+            'all_possible_diseases': ['Common Cold', 'Allergy', 'Pneumonia'],
+        },
+    }
+
+
+def benchmark(count, workers_list):
+    jobs = [(f'{i:04d}.pdf', _sample_report(i)) for i in range(count)]
+    start = time.perf_counter()
+    for job in jobs:
+        _render_named(job)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'mode': 'sequential', 'reports': count, 'seconds': round(elapsed, 3),
+                      'reports_per_sec': round(count / elapsed, 1)}))
+    for workers in workers_list:
+        with process_pool(workers) as pool:
+            # Warm the workers so process start-up is not measured
+            list(pool.map(_render_named, jobs[:workers]))
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in stream_zip(render_all(jobs, pool, 2 * workers)))
+            elapsed = time.perf_counter() - start
+        print(json.dumps({'mode': 'process_pool_zip', 'workers': workers, 'reports': count,
+                          'zip_bytes': size, 'seconds': round(elapsed, 3),
+                          'reports_per_sec': round(count / elapsed, 1)}))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Benchmark bulk PDF report rendering')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, os.cpu_count() or 1})))
+    args = parser.parse_args()
+    if not HAVE_REPORTLAB:
+        parser.error('reportlab not installed; install with `pip install reportlab`')
+    # Run through the imported module so jobs reach the workers by its name
+    import reports
+    reports.benchmark(args.count, [int(n) for n in args.workers.split(',')])
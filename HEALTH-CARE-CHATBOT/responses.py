@@ -0,0 +1,168 @@
+"""Fast JSON encoding and response compression for the API.
+
+* ``FastJSONProvider``  Flask JSON provider backed by ``orjson`` when it is
+                        installed (NumPy arrays and scalars serialize
+                        natively); falls back to the standard library with a
+                        NumPy-aware ``default``
+* ``StaticPayload``     a JSON body encoded and gzip-compressed once, with an
+                        ETag, for responses that only change with the model
+* ``compress_response`` gzip for dynamic JSON responses above a size threshold
+                        when the client accepts it
+
+``python responses.py`` benchmarks encode time and payload sizes.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Fast JSON encoding (optional)
+try:
+    import orjson
+    HAVE_ORJSON = True
+except Exception:
+    HAVE_ORJSON = False
+
+# Dynamic responses smaller than this are sent uncompressed
+MIN_GZIP_BYTES = 1024
+GZIP_LEVEL = 6
+
+
+def _default(obj):
+    """Convert NumPy/pandas values the encoders do not handle natively."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+if HAVE_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps_bytes(obj):
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """``jsonify`` / ``request.get_json`` via ``dumps_bytes`` and ``orjson``."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if HAVE_ORJSON:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def _accepts_gzip(accept_encoding):
+    return any(part.split(';')[0].strip() == 'gzip'
+               for part in (accept_encoding or '').lower().split(','))
+
+
+class StaticPayload:
+    """A JSON body encoded and compressed once, served with an ETag."""
+
+    def __init__(self, obj, version=''):
+        self.body = dumps_bytes(obj)
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha256(version.encode() + self.body).hexdigest()[:16]
+
+    def response(self, request):
+        """304 if the client's copy is current, else the (compressed) body."""
+        gzipped = _accepts_gzip(request.headers.get('Accept-Encoding'))
+        etag = f'{self.etag}-gzip' if gzipped else self.etag
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.gzipped if gzipped else self.body, mimetype='application/json')
+            if gzipped:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+def compress_response(response, accept_encoding, min_size=MIN_GZIP_BYTES):
+    """Gzip a buffered JSON response in place when worthwhile."""
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not _accepts_gzip(accept_encoding):
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def _time(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def benchmark(repeat=2000):
+    import pandas as pd
+    training = pd.read_csv(os.path.join(BASE_DIR, 'Training.csv'))
+    symptoms = list(training.columns[:-1])
+    diseases = sorted(training['prognosis'].str.strip().unique())
+    diagnose = {
+        'disease': 'Common Cold', 'confidence': np.float64(0.93),
+        'symptoms_given': symptoms[:4], 'symptoms_present': symptoms[:6],
+        'votes': np.arange(len(diseases), dtype=np.int64),
+        'description': 'x' * 300, 'precautions': ['rest', 'fluids', 'consult a doctor', 'warm drinks'],
+    }
+    batch = {'results': [dict(diagnose, case=i) for i in range(200)]}
+    payloads = {'symptoms': {'symptoms': symptoms}, 'diseases': {'diseases': diseases},
+                'diagnose': diagnose, 'batch_200': batch}
+
+    def stdlib(obj):
+        return json.dumps(obj, default=_default).encode('utf-8')
+
+    for name, obj in payloads.items():
+        body = dumps_bytes(obj)
+        n = max(1, repeat // (50 if name == 'batch_200' else 1))
+        row = {
+            'payload': name,
+            'bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body, compresslevel=GZIP_LEVEL)),
+            'stdlib_us': round(_time(lambda: stdlib(obj), n), 1),
+            'encoder': 'orjson' if HAVE_ORJSON else 'json',
+            'encoder_us': round(_time(lambda: dumps_bytes(obj), n), 1),
+            'gzip_us': round(_time(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL), n), 1),
+        }
+        print(json.dumps(row))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding and compression')
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+    benchmark(args.repeat)
@@ -0,0 +1,113 @@
+"""Thread-scaling benchmark for diagnosis in a single process.
+
+Serving state is read-only after load (frozen mappings, read-only arrays,
+per-version symptom paths), so request threads share nothing mutable on the
+diagnosis path apart from the locked counters. On a free-threaded CPython
+build (``python3.14t``, GIL disabled) throughput should then grow almost
+linearly with threads, up to the number of cores; with the GIL it stays
+roughly flat. Both are measured:
+
+* ``pipeline``: ``app.diagnose_symptoms`` called directly
+* ``route``: full ``POST /api/diagnose`` requests through the Flask test client,
+  served by the view without its admission guard; with the guard (8 in
+  flight, 32 queued) more than 8 threads would measure the semaphore and
+  more than 40 would be shed with 503
+
+::
+
+    python3.14t scaling.py --threads 1,2,4,8 --seconds 3
+
+Rate limits are lifted and history goes to a throwaway database for the
+run, so admission control and disk writes are not what is measured.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+CASES = [
+    'I have fever, cough and a headache',
+    'itching, skin rash and nodal skin eruptions',
+    'stomach pain, vomiting and acidity',
+    'yellowish skin, dark urine and fatigue',
+    'chest pain, breathlessness and sweating',
+    'joint pain, swelling joints and stiff neck',
+]
+
+
+def gil_enabled():
+    check = getattr(sys, '_is_gil_enabled', None)
+    return True if check is None else check()
+
+
+def run(worker, threads, seconds):
+    """Operations per second with ``threads`` threads calling ``worker(i)``."""
+    stop = threading.Event()
+    start_line = threading.Barrier(threads + 1)
+    counts = [0] * threads
+
+    def loop(t):
+        start_line.wait()
+        n = 0
+        while not stop.is_set():
+            worker(t * 7919 + n)
+            n += 1
+        counts[t] = n
+
+    pool = [threading.Thread(target=loop, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    start_line.wait()
+    started = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def benchmark(thread_counts, seconds):
+    import app
+    symptom_sets = [app.extract_symptoms_from_text(case, app.chk_dis) for case in CASES]
+    version = app.registry.get(app.registry.primary)
+    client_local = threading.local()
+    # Route past the admission guard so its concurrency cap is not what is measured
+    app.app.view_functions['diagnose'] = app.diagnose.__wrapped__
+
+    def pipeline(i):
+        app.diagnose_symptoms(version, symptom_sets[i % len(symptom_sets)])
+
+    def route(i):
+        client = getattr(client_local, 'client', None)
+        if client is None:
+            client = client_local.client = app.app.test_client()
+        response = client.post('/api/diagnose', json={'symptoms': CASES[i % len(CASES)]})
+        if response.status_code != 200:
+            raise RuntimeError(f'/api/diagnose returned {response.status_code}')
+
+    print(json.dumps({'python': sys.version.split()[0], 'gil_enabled': gil_enabled(),
+                      'cpus': os.cpu_count()}))
+    for mode, worker in (('pipeline', pipeline), ('route', route)):
+        worker(0)
+        base = None
+        for threads in thread_counts:
+            rate = run(worker, threads, seconds)
+            base = base or rate / threads
+            print(json.dumps({'mode': mode, 'threads': threads, 'ops_per_sec': round(rate, 1),
+                              'speedup': round(rate / base, 2),
+                              'efficiency': round(rate / base / threads, 2)}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure diagnosis throughput across threads')
+    parser.add_argument('--threads', default='1,2,4,8')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+    # Measure the pipeline, not admission control or the history database
+    os.environ['MEDICHAT_RATE_LIMIT'] = '1000000'
+    os.environ['MEDICHAT_RATE_BURST'] = '1000000'
+    os.environ.setdefault('MEDICHAT_HISTORY_DB', os.path.join(tempfile.mkdtemp(), 'scaling.db'))
+    benchmark([int(n) for n in args.threads.split(',')], args.seconds)
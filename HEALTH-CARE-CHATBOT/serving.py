@@ -0,0 +1,145 @@
+"""Serving structures that need neither pandas nor scikit-learn.
+
+``FlatTree`` holds a fitted decision tree as plain NumPy arrays under the
+same attribute names as scikit-learn's ``tree_`` (``feature``,
+``threshold``, ``children_left``, ``children_right``, ``value``), so the
+diagnosis traversal in app.py runs on it unchanged, plus a vectorized
+``predict``. app.py serves every model version from one of these.
+
+``ServingArtifact`` bundles the tree with the symptom columns, class labels
+and the disease -> symptoms table into one ``.npz`` file. A worker started
+with ``MEDICHAT_SERVING_ARTIFACT`` loads it instead of reading the CSVs and
+training, so it never imports pandas or scikit-learn::
+
+    python serving.py -o build/serving_model.npz      # full stack, once
+    MEDICHAT_SERVING_ARTIFACT=build/serving_model.npz python app.py
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARTIFACT = os.path.join(BASE_DIR, 'build', 'serving_model.npz')
+
+# Same sentinels as sklearn.tree._tree
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+class FlatTree:
+    """A fitted decision tree as NumPy arrays."""
+
+    def __init__(self, feature, threshold, children_left, children_right, value, classes):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.children_left = np.asarray(children_left, dtype=np.intp)
+        self.children_right = np.asarray(children_right, dtype=np.intp)
+        # (n_nodes, 1, n_classes), as in sklearn; only non-zero entries matter
+        self.value = np.asarray(value, dtype=np.float32)
+        self.classes = np.asarray(classes)
+        self.node_count = len(self.feature)
+
+        # Leaves point at themselves so predict() can step a whole batch
+        # a fixed number of levels
+        is_leaf = self.children_left == TREE_LEAF
+        own = np.arange(self.node_count)
+        self._left = np.where(is_leaf, own, self.children_left)
+        self._right = np.where(is_leaf, own, self.children_right)
+        self._feature = np.where(is_leaf, 0, self.feature)
+        self._threshold = np.where(is_leaf, np.inf, self.threshold)
+        self._leaf_class = self.classes[np.argmax(self.value[:, 0, :], axis=1)]
+        self._depth = self._compute_depth()
+        # Shared by every request thread, so nothing may write to them
+        for array in (self.feature, self.threshold, self.children_left, self.children_right, self.value,
+                      self.classes, self._left, self._right, self._feature, self._threshold, self._leaf_class):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_sklearn(cls, clf):
+        tree_ = clf.tree_
+        return cls(tree_.feature, tree_.threshold, tree_.children_left, tree_.children_right,
+                   tree_.value, clf.classes_)
+
+    def _compute_depth(self):
+        depth = np.zeros(self.node_count, dtype=np.intp)
+        for node in range(self.node_count):
+            if self.children_left[node] != TREE_LEAF:
+                depth[self.children_left[node]] = depth[node] + 1
+                depth[self.children_right[node]] = depth[node] + 1
+        return int(depth.max()) if self.node_count else 0
+
+    def get_depth(self):
+        return self._depth
+
+    def predict(self, X):
+        """Class of each row of ``X`` (same result as the sklearn tree)."""
+        X = np.asarray(X, dtype=np.float64)
+        rows = np.arange(len(X))
+        nodes = np.zeros(len(X), dtype=np.intp)
+        for _ in range(self._depth):
+            go_right = X[rows, self._feature[nodes]] > self._threshold[nodes]
+            nodes = np.where(go_right, self._right[nodes], self._left[nodes])
+        return self._leaf_class[nodes]
+
+    def arrays(self):
+        return {
+            'feature': self.feature, 'threshold': self.threshold,
+            'children_left': self.children_left, 'children_right': self.children_right,
+            'value': self.value, 'classes': self.classes,
+        }
+
+
+class ServingArtifact:
+    """Everything a worker needs to diagnose, in one file."""
+
+    def __init__(self, tree, columns, symptoms, labels, disease_symptoms, accuracy=None):
+        self.tree = tree
+        self.columns = list(columns)
+        self.symptoms = list(symptoms)
+        self.labels = np.asarray(labels)
+        self.disease_symptoms = disease_symptoms
+        self.accuracy = accuracy
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {
+            'columns': self.columns,
+            'symptoms': self.symptoms,
+            'labels': [str(label) for label in self.labels],
+            'disease_symptoms': {disease: list(symptoms) for disease, symptoms in self.disease_symptoms.items()},
+            'accuracy': self.accuracy,
+        }
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), **self.tree.arrays())
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            tree = FlatTree(data['feature'], data['threshold'], data['children_left'],
+                            data['children_right'], data['value'], data['classes'])
+        return cls(tree, meta['columns'], meta['symptoms'], meta['labels'],
+                   meta['disease_symptoms'], meta['accuracy'])
+
+
+def build(output):
+    """Train through app.py (full stack) and save its primary model."""
+    import app
+    version = app.registry.get(app.registry.primary)
+    artifact = ServingArtifact(version.model, version.columns, list(app.cols), app.class_labels,
+                               app.disease_symptoms, version.accuracy)
+    artifact.save(output)
+    logging.info('Wrote serving artifact %s (%d nodes, %d symptoms, %.1f KB)', output,
+                 version.model.node_count, len(version.columns), os.path.getsize(output) / 1024)
+    return output
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Build the pandas-free serving artifact')
+    parser.add_argument('-o', '--output', default=DEFAULT_ARTIFACT)
+    args = parser.parse_args()
+    build(args.output)
@@ -0,0 +1,124 @@
+"""Disease-to-disease similarity over symptom profiles.
+
+Each disease's symptom profile (the symptoms seen with it in the training
+data) is packed into a bitset, one bit per symptom column. Shared symptom
+counts for every pair come from one vectorized AND plus popcount over the
+packed rows, and Jaccard and cosine similarity follow from those counts and
+the profile sizes. This runs once at model load; each disease's nearest
+neighbours are sorted then too, so a related-diseases lookup only slices a
+precomputed list.
+
+app.py uses it to rank and group the differential in ``/api/diagnose`` and
+to serve ``/api/related_diseases``.
+"""
+import numpy as np
+
+# numpy >= 2.0 has a vectorized popcount; older versions use a byte table
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(a):
+        return _BYTE_COUNTS[a]
+
+METRICS = ('jaccard', 'cosine')
+
+
+class DiseaseSimilarity:
+    """Pairwise similarity matrices and top-k neighbours per disease."""
+
+    def __init__(self, profiles, symptoms, top_k=10):
+        """``profiles`` maps each disease to its symptoms, ``symptoms`` lists every column."""
+        column = {symptom: i for i, symptom in enumerate(symptoms)}
+        # Class labels can carry stray whitespace; expose them stripped
+        self.names = [str(name).strip() for name in profiles]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.symptoms = list(symptoms)
+
+        present = np.zeros((len(self.names), len(self.symptoms)), dtype=bool)
+        for row, disease_symptoms in enumerate(profiles.values()):
+            present[row, [column[s] for s in disease_symptoms if s in column]] = True
+        self.bits = np.packbits(present, axis=1)
+        sizes = present.sum(axis=1).astype(np.float64)
+
+        # Shared symptoms for every pair: AND the packed rows, count bits
+        shared = _popcount(self.bits[:, None, :] & self.bits[None, :, :]).sum(axis=2, dtype=np.int32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            union = sizes[:, None] + sizes[None, :] - shared
+            self.matrices = {
+                'jaccard': np.nan_to_num(shared / union).astype(np.float32),
+                'cosine': np.nan_to_num(shared / np.sqrt(np.outer(sizes, sizes))).astype(np.float32),
+            }
+        self.shared = shared
+        self._present = present
+
+        self.top_k = top_k
+        self.neighbours = {metric: self._neighbours(matrix, top_k) for metric, matrix in self.matrices.items()}
+
+    def _neighbours(self, matrix, k):
+        """Top ``k`` other diseases per disease, best first."""
+        result = []
+        for row in range(len(self.names)):
+            scores = matrix[row].copy()
+            scores[row] = -1.0
+            order = np.argsort(-scores, kind='stable')[:k]
+            result.append([
+                (self.names[j], round(float(scores[j]), 4), self.shared_symptoms(row, j))
+                for j in order if scores[j] > 0
+            ])
+        return result
+
+    def __contains__(self, disease):
+        return str(disease).strip() in self.index
+
+    def similarity(self, a, b, metric='jaccard'):
+        i, j = self.index.get(str(a).strip()), self.index.get(str(b).strip())
+        if i is None or j is None:
+            return 0.0
+        return float(self.matrices[metric][i, j])
+
+    def shared_symptoms(self, i, j):
+        """Symptom columns shared by the diseases in rows ``i`` and ``j``."""
+        return [self.symptoms[c] for c in np.flatnonzero(self._present[i] & self._present[j])]
+
+    def related(self, disease, limit=5, metric='jaccard'):
+        """Most similar diseases: ``[{'disease', 'similarity', 'shared_symptoms'}, ...]``."""
+        row = self.index.get(str(disease).strip())
+        if row is None:
+            return []
+        return [
+            {'disease': name, 'similarity': score, 'shared_symptoms': shared}
+            for name, score, shared in self.neighbours[metric][row][:limit]
+        ]
+
+    def rank_differential(self, scores, top_disease, group_threshold=0.25, metric='jaccard'):
+        """Order candidate diseases and group the ones with overlapping profiles.
+
+        ``scores`` maps each candidate to its summed prediction confidence.
+        Candidates with a score of 0 (a leaf the symptoms never reached with
+        any confidence) are left out, except the top disease. The rest are
+        ranked by score, then by similarity to the top disease. Walking that order, each candidate joins the first group
+        whose leading disease is at least ``group_threshold`` similar, or
+        leads a new group.
+        """
+        supported = [d for d in scores if scores[d] > 0 or d == top_disease]
+        ranked = sorted(supported, key=lambda d: (-scores[d], -self.similarity(d, top_disease, metric)))
+        differential = [
+            {'disease': str(d).strip(), 'score': round(float(scores[d]), 4),
+             'similarity_to_top': round(self.similarity(d, top_disease, metric), 4)}
+            for d in ranked
+        ]
+        groups = []
+        for entry in differential:
+            for group in groups:
+                if self.similarity(group[0], entry['disease'], metric) >= group_threshold:
+                    group.append(entry['disease'])
+                    break
+            else:
+                groups.append([entry['disease']])
+        return differential, groups
+
+    def stats(self):
+        return {'diseases': len(self.names), 'symptoms': len(self.symptoms), 'bytes_per_profile': self.bits.shape[1],
+                'top_k': self.top_k}
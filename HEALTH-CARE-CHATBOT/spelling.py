@@ -0,0 +1,198 @@
+"""Typo-tolerant symptom vocabulary (symmetric-delete spelling index).
+
+Every vocabulary word is stored under all of its deletes up to
+``max_distance`` characters. A lookup generates the deletes of the query and
+intersects, so candidates are found with a handful of dict probes no matter
+how large the vocabulary is; only those candidates are verified with a
+bounded Damerau-Levenshtein distance. This is the SymSpell approach.
+
+app.py builds one index at model load over symptom-name tokens, synonym
+phrases and disease names, and uses it in ``/api/diagnose`` and
+``/api/suggest_symptoms``.
+
+Only words that are neither in that vocabulary nor ordinary English
+(``common_words.txt``, with simple inflections) are treated as typos, so
+"peeing" or "thirst" are never rewritten into a nearby symptom word.
+"""
+import functools
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMMON_WORDS_FILE = os.path.join(BASE_DIR, 'common_words.txt')
+
+WORD_RE = re.compile(r'[a-z]+')
+
+# Common words in symptom descriptions that must never be "corrected"
+STOPWORDS = frozenset('''
+    a about after also am an and any are as at be been before but by can cant
+    day days did do does dont each feel feeling feels few for from get got had
+    has have having he her him his how i im in is it its just last like little
+    lot me more most much my no not now of on or other our out over really she
+    since so some still than that the them then there they this those very
+    was we week weeks were what when which while who will with would you your
+'''.split())
+
+
+@functools.lru_cache(maxsize=1)
+def load_common_words(path=COMMON_WORDS_FILE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return frozenset(w for line in f if not line.startswith('#') for w in line.split())
+    except FileNotFoundError:
+        return frozenset()
+
+
+def _base_forms(word):
+    """``word`` plus the stems it may be inflected from (-s, -ing, -ed, -ly...)."""
+    forms = {word}
+    for suffix in ('s', 'es', 'ed', 'er', 'est', 'ing', 'ly', 'ness', 'ful'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            stem = word[:-len(suffix)]
+            forms.update((stem, stem + 'e'))
+            if len(stem) > 2 and stem[-1] == stem[-2]:
+                forms.add(stem[:-1])         # stopping -> stop
+            if stem.endswith('i'):
+                forms.add(stem[:-1] + 'y')   # worried -> worry
+    return forms
+
+
+def _deletes(word, max_distance):
+    """All strings reachable from ``word`` by deleting up to ``max_distance`` chars."""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def edit_distance(a, b, max_distance):
+    """Optimal string alignment distance, or ``max_distance + 1`` if larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev_prev[j - 2] + 1)
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev_prev, prev = prev, cur
+    return prev[-1]
+
+
+class SpellingIndex:
+    """Symmetric-delete index from vocabulary words to optional payloads."""
+
+    def __init__(self, max_distance=2, english=()):
+        self.max_distance = max_distance
+        self.words = {}        # word -> frequency
+        self.payloads = {}     # word -> set of payloads (e.g. symptom names)
+        self._deletes = {}     # delete variant -> set of words
+        self.english = frozenset(english)
+        self.symptom_words = {}    # symptom -> its name as a tuple of words
+
+    def add(self, word, payload=None):
+        word = word.lower()
+        if not word:
+            return
+        if word not in self.words:
+            for variant in _deletes(word, self.max_distance):
+                self._deletes.setdefault(variant, set()).add(word)
+        self.words[word] = self.words.get(word, 0) + 1
+        if payload is not None:
+            self.payloads.setdefault(word, set()).add(payload)
+
+    def lookup(self, word, max_distance=None, with_payload=False):
+        """Return ``[(word, distance), ...]`` best first.
+
+        With ``with_payload`` only words carrying a payload are considered.
+        """
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        word = word.lower()
+        candidates = set()
+        for variant in _deletes(word, max_distance):
+            candidates |= self._deletes.get(variant, set())
+        if with_payload:
+            candidates = {c for c in candidates if c in self.payloads}
+        results = []
+        for candidate in candidates:
+            distance = 0 if candidate == word else edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                results.append((candidate, distance))
+        results.sort(key=lambda r: (r[1], -self.words[r[0]], r[0]))
+        return results
+
+    def is_english_word(self, word):
+        return not self.english.isdisjoint(_base_forms(word))
+
+    def allowed_distance(self, word):
+        """Edit budget for a token: none for known words, less for short ones."""
+        if len(word) < 4 or word in STOPWORDS or word in self.words or self.is_english_word(word):
+            return 0
+        return 1 if len(word) < 8 else 2
+
+    def correct_word(self, word):
+        word = word.lower()
+        budget = self.allowed_distance(word)
+        if not budget:
+            return word
+        matches = self.lookup(word, budget)
+        return matches[0][0] if matches else word
+
+    def correct_text(self, text):
+        """Replace out-of-vocabulary words in ``text`` with their best match."""
+        return WORD_RE.sub(lambda m: self.correct_word(m.group(0)), text.lower())
+
+    def _token_matches(self, word):
+        """Symptom-name words ``word`` may stand for: itself, or its closest typo matches."""
+        budget = self.allowed_distance(word)
+        if not budget:
+            return {word}
+        matches = self.lookup(word, budget, with_payload=True)
+        return {m for m, d in matches if d == matches[0][1]} if matches else {word}
+
+    def match_symptoms(self, text):
+        """Symptoms whose whole name appears in ``text``, word by word, allowing typos.
+
+        Every word of the text is matched on its own, so a misspelled
+        symptom is found next to correctly spelled ones. A multi-word
+        symptom only matches when all of its words appear in order.
+        """
+        tokens = [self._token_matches(w) for w in WORD_RE.findall(text.lower())]
+        found = []
+        for symptom, words in self.symptom_words.items():
+            n = len(words)
+            for start in range(len(tokens) - n + 1):
+                if all(words[i] in tokens[start + i] for i in range(n)):
+                    found.append(symptom)
+                    break
+        return found
+
+
+def build_index(symptoms, phrases, diseases, max_distance=2, english=None):
+    """Index symptom-name tokens, synonym phrase words and disease names.
+
+    Symptom tokens carry the symptom name as payload so that a misspelled
+    word can be resolved straight to a symptom column. ``english`` defaults
+    to the bundled common words.
+    """
+    index = SpellingIndex(max_distance, load_common_words() if english is None else english)
+    for symptom in symptoms:
+        words = tuple(WORD_RE.findall(symptom.lower()))
+        index.symptom_words[symptom] = words
+        for word in words:
+            index.add(word, payload=symptom)
+    for key, keywords in phrases.items():
+        for phrase in [key] + list(keywords):
+            for word in WORD_RE.findall(phrase.lower()):
+                index.add(word)
+    for disease in diseases:
+        for word in WORD_RE.findall(str(disease).lower()):
+            index.add(word)
+    return index
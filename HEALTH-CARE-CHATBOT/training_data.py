@@ -0,0 +1,71 @@
+"""Training-set preprocessing shared by app.py and chat_bot.py.
+
+Training.csv repeats the same handful of symptom rows ~120 times per disease.
+Collapsing exact duplicates into unique rows with a ``sample_weight`` count
+gives the classifiers the same impurity statistics on a fraction of the rows.
+
+Run ``python training_data.py`` to print the compression report and check
+that a tree fitted on the compressed rows predicts exactly like one fitted on
+the raw rows.
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LABEL_COLUMN = 'prognosis'
+
+
+def compress_rows(x, y):
+    """Collapse duplicate (symptoms, label) rows.
+
+    Returns ``(x_unique, y_unique, sample_weight)`` where ``sample_weight[i]``
+    is the number of raw rows equal to ``(x_unique[i], y_unique[i])``. Rows
+    keep the order of their first occurrence.
+    """
+    frame = pd.DataFrame(x).copy()
+    frame[LABEL_COLUMN] = np.asarray(y)
+    counts = frame.groupby(list(frame.columns), sort=False).size()
+    unique = counts.index.to_frame(index=False)
+    x_unique = unique.drop(columns=[LABEL_COLUMN])
+    y_unique = unique[LABEL_COLUMN].to_numpy()
+    return x_unique, y_unique, counts.to_numpy(dtype=np.float64)
+
+
+def compression_report(n_rows, sample_weight, name='training'):
+    """Log and return the raw/unique row counts for a compressed set."""
+    n_unique = len(sample_weight)
+    ratio = n_rows / max(n_unique, 1)
+    logging.info('Compressed %s rows: %d -> %d unique (%.1fx)', name, n_rows, n_unique, ratio)
+    return {'rows': int(n_rows), 'unique_rows': int(n_unique), 'ratio': round(ratio, 2)}
+
+
+def check_predictions_unchanged(x, y, eval_x, random_state=0):
+    """Fit a tree on raw and on compressed rows and compare predictions.
+
+    Both trees use the same ``random_state`` so feature-order tie breaking is
+    identical. Returns the number of rows of ``eval_x`` where they disagree.
+    """
+    from sklearn.tree import DecisionTreeClassifier
+
+    x_unique, y_unique, weights = compress_rows(x, y)
+    raw = DecisionTreeClassifier(random_state=random_state).fit(x, y)
+    compact = DecisionTreeClassifier(random_state=random_state).fit(x_unique, y_unique, sample_weight=weights)
+    return int(np.sum(raw.predict(eval_x) != compact.predict(eval_x)))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    training = pd.read_csv(os.path.join(BASE_DIR, 'Training.csv'))
+    testing = pd.read_csv(os.path.join(BASE_DIR, 'Testing.csv'))
+    cols = training.columns[:-1]
+    _, _, weights = compress_rows(training[cols], training[LABEL_COLUMN])
+    report = compression_report(len(training), weights)
+    print(report)
+    eval_x = pd.concat([training[cols], testing[cols]], ignore_index=True)
+    mismatches = check_predictions_unchanged(training[cols], training[LABEL_COLUMN], eval_x)
+    print(f'prediction mismatches on {len(eval_x)} rows: {mismatches}')
+    raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,212 @@
+"""Offline text-to-speech rendered to cached WAV clips.
+
+Instead of speaking on the server's own audio device, ``TTSRenderer``
+renders text to WAV files that the browser can play. Clips are named by a
+hash of (voice, rate, text), so a clip is rendered once and can be served
+forever with immutable cache headers.
+
+Each render thread owns one ``pyttsx3`` engine, created on first use and
+reused for every clip. The default is a single render thread because the
+common drivers (eSpeak, SAPI5) are not safe to drive concurrently.
+``prerender()`` queues a batch of fixed texts (disease descriptions and
+precautions) in the background so they are cached before anyone asks.
+
+``python tts.py`` pre-renders every fixed text through app.py and exits.
+"""
+import argparse
+import collections
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIR = os.path.join(BASE_DIR, 'tts_cache')
+
+# Text to speech (optional; also needs an OS speech backend such as eSpeak)
+try:
+    import pyttsx3
+    HAVE_PYTTSX3 = True
+except Exception:
+    HAVE_PYTTSX3 = False
+
+_STOP = object()
+
+
+class TTSUnavailable(RuntimeError):
+    """No speech engine could be started on this server."""
+
+
+class TTSRenderer:
+    """Render text to cached WAV files on dedicated engine threads."""
+
+    def __init__(self, cache_dir=DEFAULT_DIR, voice='english+f5', rate=130, workers=1,
+                 max_pending=1000, max_clips=5000):
+        self.cache_dir = cache_dir
+        self.voice = voice
+        self.rate = rate
+        self.max_clips = max_clips
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._local = threading.local()
+        self.error = None if HAVE_PYTTSX3 else 'pyttsx3 not installed'
+        self.counters = collections.Counter()
+        os.makedirs(cache_dir, exist_ok=True)
+        # Oldest first, so the cache can be trimmed to max_clips
+        self._clips = collections.OrderedDict(
+            (name, None) for name in sorted(
+                (n for n in os.listdir(cache_dir) if n.endswith('.wav')),
+                key=lambda n: os.path.getmtime(os.path.join(cache_dir, n))))
+        self._threads = [threading.Thread(target=self._work, name=f'tts-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def available(self):
+        return self.error is None
+
+    def clip_name(self, text):
+        digest = hashlib.sha256(f'{self.voice}|{self.rate}|{text}'.encode('utf-8')).hexdigest()[:24]
+        return f'{digest}.wav'
+
+    def path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def cached(self, text):
+        """Clip name if ``text`` is already rendered, else None."""
+        name = self.clip_name(text)
+        return name if name in self._clips else None
+
+    def submit(self, text):
+        """Future resolving to the clip name; duplicate requests share one render."""
+        name = self.clip_name(text)
+        future = Future()
+        if name in self._clips:
+            self.counters['hits'] += 1
+            future.set_result(name)
+            return future
+        if not self.available:
+            future.set_exception(TTSUnavailable(self.error))
+            return future
+        with self._lock:
+            pending = self._inflight.get(name)
+            if pending is not None:
+                return pending
+            self._inflight[name] = future
+        try:
+            self._queue.put_nowait((name, text, future))
+        except queue.Full:
+            with self._lock:
+                self._inflight.pop(name, None)
+            self.counters['dropped'] += 1
+            future.set_exception(TTSUnavailable('Speech render queue is full'))
+        return future
+
+    def prerender(self, texts):
+        """Queue every not-yet-cached text; returns how many were queued."""
+        queued = 0
+        for text in dict.fromkeys(texts):
+            if text and self.cached(text) is None:
+                future = self.submit(text)
+                if future.done() and future.exception():
+                    break
+                queued += 1
+        logging.info('TTS pre-render: %d clips queued', queued)
+        return queued
+
+    def _engine(self):
+        engine = getattr(self._local, 'engine', None)
+        if engine is None:
+            # Engine() directly: pyttsx3.init() shares one engine per driver
+            engine = pyttsx3.Engine()
+            engine.setProperty('voice', self.voice)
+            engine.setProperty('rate', self.rate)
+            self._local.engine = engine
+        return engine
+
+    def _render(self, name, text):
+        target = self.path(name)
+        tmp = f'{target}.{threading.get_ident()}.tmp'
+        engine = self._engine()
+        engine.save_to_file(text, tmp)
+        engine.runAndWait()
+        if not os.path.exists(tmp) or os.path.getsize(tmp) == 0:
+            raise RuntimeError('speech engine produced no audio')
+        os.replace(tmp, target)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            name, text, future = job
+            try:
+                start = time.perf_counter()
+                self._render(name, text)
+                self.counters['rendered'] += 1
+                self.counters['render_ms'] += round((time.perf_counter() - start) * 1000)
+                self._add_clip(name)
+                future.set_result(name)
+            except Exception as e:
+                self.counters['failed'] += 1
+                if not hasattr(self._local, 'engine'):
+                    # The engine itself could not start; stop accepting work
+                    self.error = f'{type(e).__name__}: {e}'
+                    logging.error('TTS unavailable: %s', self.error)
+                else:
+                    logging.error('TTS render failed: %s', e)
+                future.set_exception(TTSUnavailable(str(e)))
+            finally:
+                with self._lock:
+                    self._inflight.pop(name, None)
+
+    def _add_clip(self, name):
+        with self._lock:
+            self._clips[name] = None
+            self._clips.move_to_end(name)
+            evicted = []
+            while len(self._clips) > self.max_clips:
+                evicted.append(self._clips.popitem(last=False)[0])
+        for old in evicted:
+            try:
+                os.remove(self.path(old))
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            'available': self.available,
+            'error': self.error,
+            'clips': len(self._clips),
+            'pending': self._queue.qsize(),
+            **self.counters,
+        }
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(_STOP)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Pre-render speech clips for the fixed texts')
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+    import app
+    if not app.tts.available:
+        parser.error(f'text to speech unavailable: {app.tts.error}')
+    futures = [app.tts.submit(text) for text in app.tts_fixed_texts()]
+    deadline = time.time() + args.timeout
+    failed = 0
+    for future in futures:
+        try:
+            future.result(timeout=max(0.0, deadline - time.time()))
+        except Exception:
+            failed += 1
+    logging.info('Rendered %d clips into %s (%d failed): %s', len(futures) - failed,
+                 app.tts.cache_dir, failed, app.tts.stats())